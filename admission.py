@@ -0,0 +1,109 @@
+"""!
+@file admission.py
+@brief Kontrola dopuszczania renderowań wizualizacji do modelu.
+
+Liczba renderowań w toku (czekających w planiście i wykonywanych) jest
+ograniczona globalnie i na klienta. Żądania ponad limit są odrzucane od
+razu, z czasem ponowienia szacowanym na podstawie ostatnich czasów
+renderowania, zamiast ustawiać się w nieograniczonej kolejce.
+"""
+
+import math
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+
+class AdmissionRejected(Exception):
+    """!
+    @brief Zgłaszany, gdy renderowanie przekroczyłoby limit kolejki lub klienta.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        """!
+        @param reason queue_full lub client_limit
+        @param retry_after Sugerowany czas ponowienia w sekundach
+        """
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """!
+    @brief Ograniczona liczba renderowań w toku z limitem na klienta.
+
+    Używana wyłącznie z wątku pętli zdarzeń, więc nie wymaga blokad.
+    """
+
+    def __init__(self, max_in_flight: int, max_per_client: int, capacity: int, initial_render: float = 2.0):
+        """!
+        @param max_in_flight Maksymalna liczba renderowań w toku (0 wyłącza limit)
+        @param max_per_client Maksymalna liczba renderowań w toku jednego klienta (0 wyłącza limit)
+        @param capacity Liczba renderowań wykonywanych równolegle (wątki x rozmiar partii)
+        @param initial_render Szacowany czas renderowania w sekundach przed pierwszym pomiarem
+        """
+        self.max_in_flight = max_in_flight
+        self.max_per_client = max_per_client
+        self.capacity = max(1, capacity)
+        ## Średnia krocząca (EWMA) czasu renderowania w sekundach
+        self.render_estimate = initial_render
+        self.in_flight = 0
+        ## klient -> liczba jego renderowań w toku
+        self._clients = Counter()
+        self.admitted = 0
+        self.rejected = Counter()
+
+    def retry_after(self) -> int:
+        """!
+        @brief Szacuje w sekundach, kiedy zwolni się miejsce w kolejce.
+        """
+        rounds = math.ceil(max(self.in_flight, 1) / self.capacity)
+        return max(1, math.ceil(rounds * self.render_estimate))
+
+    def observe(self, seconds: float):
+        """!
+        @brief Uwzględnia zmierzony czas wywołania modelu w oszacowaniu.
+        """
+        self.render_estimate = 0.8 * self.render_estimate + 0.2 * seconds
+
+    @contextmanager
+    def admit(self, client: Optional[str]):
+        """!
+        @brief Rezerwuje miejsce dla renderowania na czas bloku with.
+
+        @param client Klucz klienta (pseudonim lub adres IP)
+        @throws AdmissionRejected jeśli kolejka jest pełna lub klient przekroczył limit
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+        if self.max_per_client and self._clients[client] >= self.max_per_client:
+            self.rejected["client_limit"] += 1
+            raise AdmissionRejected("client_limit", self.retry_after())
+
+        self.in_flight += 1
+        self._clients[client] += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._clients[client] -= 1
+            if not self._clients[client]:
+                del self._clients[client]
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca zajętość kolejki, liczniki odrzuceń i bieżące oszacowanie czasu renderowania.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_per_client": self.max_per_client,
+            "clients": len(self._clients),
+            "admitted": self.admitted,
+            "rejected": {"queue_full": self.rejected["queue_full"], "client_limit": self.rejected["client_limit"]},
+            "render_estimate_ms": round(self.render_estimate * 1000, 1),
+            "retry_after_seconds": self.retry_after(),
+        }
@@ -0,0 +1,149 @@
+"""!
+@file batching.py
+@brief Planista mikro-partii łączący równoległe żądania inferencji w jedno wywołanie modelu.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Any, Callable, List
+
+
+class MicroBatcher:
+    """!
+    @brief Zbiera żądania przez krótkie okno czasowe i wykonuje je partiami.
+
+    Partia jest zamykana po upływie okna lub po osiągnięciu maksymalnego
+    rozmiaru. Zebranie kolejnej partii zaczyna się dopiero, gdy zwolni się
+    któryś z wątków roboczych, więc pod obciążeniem partie rosną same.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        executor: Executor,
+        workers: int,
+        window: float,
+        max_batch: int
+    ):
+        """!
+        @param run_batch Synchroniczna funkcja przetwarzająca listę elementów w listę wyników
+        @param executor Pula wątków wykonująca run_batch
+        @param workers Maksymalna liczba równolegle wykonywanych partii
+        @param window Okno zbierania partii w sekundach
+        @param max_batch Maksymalny rozmiar partii
+        """
+        self._run_batch = run_batch
+        self._executor = executor
+        self._workers = workers
+        self.window = window
+        self.max_batch = max(1, max_batch)
+
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._collector = None
+
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._collector is None or self._collector.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self._workers)
+            self._collector = loop.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """!
+        @brief Dodaje element do najbliższej partii i czeka na jego wynik.
+
+        @param item Element przekazywany do run_batch
+        @return Wynik odpowiadający elementowi
+        @note Anulowanie oczekiwania przed startem partii usuwa element z partii
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    def queue_depth(self) -> int:
+        """!
+        @brief Zwraca liczbę elementów oczekujących na zebranie w partię.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+                deadline = self._loop.time() + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._slots.release()
+                raise
+
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            self._record(batch)
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            results = await self._loop.run_in_executor(
+                self._executor, self._run_batch, [item for item, _, _ in batch]
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        for _, _, submitted_at in batch:
+            wait = now - submitted_at
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca statystyki rozmiarów partii i czasu oczekiwania w kolejce.
+
+        @return Słownik ze statystykami planisty
+        """
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_queue_wait_ms": self.queue_wait_total / self.items * 1000 if self.items else 0.0,
+            "max_queue_wait_ms": self.queue_wait_max * 1000,
+            "queue_depth": self.queue_depth(),
+        }
@@ -0,0 +1,55 @@
+"""!
+@file _common.py
+@brief Funkcje wspólne dla skryptów benchmarków: percentyle i tymczasowa baza danych.
+
+Import modułu dodaje katalog główny projektu do sys.path, więc skrypty
+uruchamiane z katalogu głównego mogą importować moduły aplikacji.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+## Katalog główny projektu
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def percentile(timings, fraction):
+    """!
+    @brief Zwraca percentyl fraction (0-1) z listy czasów; NaN dla pustej listy.
+    """
+    if not timings:
+        return float("nan")
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+@contextmanager
+def temporary_database(workdir: bool = False):
+    """!
+    @brief Tworzy katalog tymczasowy z bazą bench.db i ustawia na ten czas DATABASE_URL.
+
+    @param workdir Czy uczynić katalog bieżącym (z dowiązaniem do images/), aby
+           wizualizacje i warianty zdjęć powstawały poza katalogiem projektu
+    @return Menedżer kontekstu zwracający URL bazy danych
+    """
+    previous_url = os.environ.get("DATABASE_URL")
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{directory}/bench.db"
+        os.environ["DATABASE_URL"] = url
+        if workdir:
+            os.symlink(ROOT / "images", Path(directory) / "images")
+            os.chdir(directory)
+        try:
+            yield url
+        finally:
+            os.chdir(previous_cwd)
+            if previous_url is None:
+                os.environ.pop("DATABASE_URL", None)
+            else:
+                os.environ["DATABASE_URL"] = previous_url
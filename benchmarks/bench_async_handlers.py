@@ -0,0 +1,105 @@
+"""!
+@file bench_async_handlers.py
+@brief Obciążeniowe porównanie endpointów zamówień na sesji synchronicznej (pula wątków) i AsyncSession.
+
+Do aplikacji dokładane są synchroniczne odpowiedniki GET /orders/{id}
+i GET /orders (def + get_db, jak przed przejściem na AsyncSession), po czym
+oba warianty są odpytywane równolegle przez httpx.ASGITransport w jednym
+procesie. Pula wątków FastAPI jest ograniczana do --threads, aby pokazać
+kolejkowanie endpointów synchronicznych przy małej liczbie wątków.
+Baza jest tworzona w katalogu tymczasowym.
+
+Uruchomienie z katalogu głównego projektu:
+    python benchmarks/bench_async_handlers.py --requests 2000 --concurrency 200 --threads 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from _common import percentile, temporary_database
+
+
+async def run(args):
+    import anyio.to_thread
+    import httpx
+    from fastapi import Depends
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import Session
+
+    import main
+    from database import get_db
+    from models import Order, OrderItem, Product
+
+    @main.app.get("/bench/sync/orders/{order_id}")
+    def sync_get_order(order_id: int, db: Session = Depends(get_db)):
+        return main.load_order_details(db, [order_id])[0]
+
+    @main.app.get("/bench/sync/orders")
+    def sync_list_orders(limit: int = 50, db: Session = Depends(get_db)):
+        order_ids, next_cursor = main.page_order_keys(db, [], None, limit)
+        return main.OrderListResponse(orders=main.load_order_details(db, order_ids), next_cursor=next_cursor)
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+
+    async with main.app.router.lifespan_context(main.app):
+        db = main.SessionLocal()
+        prices = dict(db.execute(select(Product.id, Product.price).where(Product.id.in_((1, 2, 3)))).all())
+        for _ in range(args.orders):
+            order_id = db.execute(
+                insert(Order).values(pseudonim="bench", total_price=sum(prices.values())).returning(Order.id)
+            ).scalar_one()
+            db.execute(insert(OrderItem), [
+                {"order_id": order_id, "product_id": product_id, "category": "flower", "quantity": 1, "unit_price": price}
+                for product_id, price in prices.items()
+            ])
+        db.commit()
+        db.close()
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            scenarios = [
+                ("GET /orders/{id}", "sync", lambda i: f"/bench/sync/orders/{i % args.orders + 1}"),
+                ("GET /orders/{id}", "async", lambda i: f"/orders/{i % args.orders + 1}"),
+                ("GET /orders", "sync", lambda i: "/bench/sync/orders?limit=50"),
+                ("GET /orders", "async", lambda i: "/orders?limit=50"),
+            ]
+            print(f"{'endpoint':<18}{'handler':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+            for name, handler, url in scenarios:
+                semaphore = asyncio.Semaphore(args.concurrency)
+                timings = []
+                errors = 0
+
+                async def request(i):
+                    nonlocal errors
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.get(url(i))
+                        timings.append((time.perf_counter() - start) * 1000)
+                        if response.status_code != 200:
+                            errors += 1
+
+                start = time.perf_counter()
+                await asyncio.gather(*(request(i) for i in range(args.requests)))
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{name:<18}{handler:<8}{args.requests / elapsed:>9.0f}"
+                    f"{statistics.median(timings):>9.2f}{percentile(timings, 0.95):>9.2f}{errors:>8}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="rozmiar puli wątków FastAPI (domyślnie w FastAPI: 40)")
+    parser.add_argument("--orders", type=int, default=500, help="liczba zamówień w bazie testowej")
+    args = parser.parse_args()
+
+    with temporary_database():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""!
+@file bench_bulk_orders.py
+@brief Przepustowość zapisu tej samej liczby zamówień przez POST /orders i POST /orders/bulk.
+
+Zamówienia mają skład typowy dla formularza (kilka kwiatów, papier,
+wstążka). Wariant pojedynczy wysyła je z --concurrency równoległymi
+żądaniami, wariant zbiorczy - partiami po --batch. Aplikacja działa
+w procesie (httpx.ASGITransport), baza jest tworzona w katalogu tymczasowym.
+
+Uruchomienie z katalogu głównego projektu:
+    python benchmarks/bench_bulk_orders.py --orders 2000 --batch 500
+"""
+
+import argparse
+import asyncio
+import time
+
+from _common import temporary_database
+
+
+def sample_order(index):
+    return {
+        "pseudonim": f"import-{index}",
+        "odbior": "dostawa",
+        "platnosc": "przelew",
+        "flowers": [{"id": 1 + index % 15, "quantity": 3}, {"id": 16 + index % 5, "quantity": 2}],
+        "papers": [{"id": 21 + index % 5}],
+        "ribbons": [{"id": 26 + index % 5}],
+    }
+
+
+async def run(args):
+    import httpx
+
+    import main
+
+    orders = [sample_order(index) for index in range(args.orders)]
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def create(order):
+                async with semaphore:
+                    response = await client.post("/orders", json=order)
+                    response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(create(order) for order in orders))
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for offset in range(0, len(orders), args.batch):
+                response = await client.post("/orders/bulk", json={"orders": orders[offset:offset + args.batch]})
+                response.raise_for_status()
+                assert response.json()["failed"] == 0
+            bulk = time.perf_counter() - start
+
+    print(f"{'endpoint':<18}{'orders':>8}{'seconds':>10}{'orders/s':>10}")
+    print(f"{'POST /orders':<18}{args.orders:>8}{single:>10.2f}{args.orders / single:>10.0f}")
+    print(f"{'POST /orders/bulk':<18}{args.orders:>8}{bulk:>10.2f}{args.orders / bulk:>10.0f}")
+    print(f"speed-up: {single / bulk:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500, help="liczba zamówień w jednym żądaniu bulk")
+    parser.add_argument("--concurrency", type=int, default=16, help="równoległe żądania POST /orders")
+    args = parser.parse_args()
+
+    with temporary_database():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""!
+@file bench_encoding.py
+@brief Porównanie rozmiaru i czasu kodowania wizualizacji w formatach PNG, JPEG i WebP.
+
+Jako obraz testowy służy zdjęcie produktu z katalogu images/ przeskalowane
+do 512x512 - podobnie jak wynik modelu ma charakter fotograficzny.
+Pierwszy wiersz to dawna ścieżka: PNG z domyślną kompresją zakodowany base64.
+
+Uruchomienie z katalogu głównego projektu:
+    python benchmarks/bench_encoding.py --image images/roza_1.png --repeat 20
+"""
+
+import argparse
+import base64
+import io
+import statistics
+import time
+
+from PIL import Image
+
+import _common  # noqa: F401 - katalog projektu w sys.path
+from image_encoding import encode_image
+
+
+## Warianty kodowania: (format, jakość)
+VARIANTS = [
+    ("png", None),
+    ("jpeg", 75),
+    ("jpeg", 85),
+    ("webp", 75),
+    ("webp", 85),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--image", default="images/roza_1.png")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB").resize((512, 512), Image.LANCZOS)
+
+    def legacy_data_url():
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        return base64.b64encode(buffered.getvalue())
+
+    print(f"{'format':<14}{'quality':>8}{'bytes':>10}{'vs legacy':>11}{'p50 ms':>9}{'max ms':>9}")
+    rows = [("png+base64", None, legacy_data_url)]
+    rows += [
+        (image_format, quality, lambda f=image_format, q=quality: encode_image(image, f, q))
+        for image_format, quality in VARIANTS
+    ]
+
+    baseline = None
+    for name, quality, encode in rows:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            data = encode()
+            timings.append((time.perf_counter() - start) * 1000)
+        baseline = baseline or len(data)
+        print(
+            f"{name:<14}{quality or '-':>8}{len(data):>10}"
+            f"{len(data) / baseline:>11.1%}{statistics.median(timings):>9.2f}{max(timings):>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""!
+@file bench_order_writes.py
+@brief Przepustowość równoległego zapisu zamówień w profilach SQLite default i production.
+
+Każdy wątek zapisujący powtarza transakcję z POST /orders: odczyt produktów
+jednym zapytaniem IN, wstawienie zamówienia i pozycji (executemany),
+zatwierdzenie. Równolegle wątki czytające odpytują listę zamówień, aby
+pokazać, czy zapisy blokują odczyty. Każdy profil dostaje świeżą bazę
+w katalogu tymczasowym.
+
+Uruchomienie z katalogu głównego projektu:
+    python benchmarks/bench_order_writes.py --writers 8 --readers 4 --seconds 5
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from datetime import date, time as clock
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from _common import percentile, temporary_database
+from database import create_database_engine
+from models import Base, Order, OrderItem, Product
+
+
+## Profile porównywane w benchmarku
+PROFILES = ("default", "production")
+
+
+def seed(session_factory):
+    db = session_factory()
+    db.add_all([
+        Product(name=f"Produkt {index}", category="flower", price=10, image="roza_1.png", max_quantity=0)
+        for index in range(20)
+    ])
+    db.commit()
+    db.close()
+
+
+def write_order(session_factory, product_ids):
+    db = session_factory()
+    try:
+        products = db.execute(select(Product).where(Product.id.in_(product_ids))).scalars().all()
+        order = Order(pseudonim="bench", data=date(2025, 1, 1), godzina=clock(12, 0), odbior="osobisty", platnosc="gotowka")
+        db.add(order)
+        db.flush()
+        db.execute(insert(OrderItem), [
+            {"order_id": order.id, "product_id": product.id, "category": product.category, "quantity": 1, "viz_id": None}
+            for product in products
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def read_orders(session_factory):
+    db = session_factory()
+    try:
+        db.execute(select(Order.id).order_by(Order.data, Order.godzina, Order.id).limit(50)).all()
+    finally:
+        db.close()
+
+
+def run_profile(profile, writers, readers, seconds):
+    with temporary_database() as url:
+        engine = create_database_engine(url, profile)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(session_factory)
+
+        deadline = time.perf_counter() + seconds
+        write_timings, read_timings = [], []
+        errors = [0]
+        lock = threading.Lock()
+
+        def loop(operation, timings):
+            local = []
+            local_errors = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError:
+                    local_errors += 1
+                    continue
+                local.append((time.perf_counter() - start) * 1000)
+            with lock:
+                timings.extend(local)
+                errors[0] += local_errors
+
+        threads = [
+            threading.Thread(target=loop, args=(lambda: write_order(session_factory, [1, 2, 3, 4, 5]), write_timings))
+            for _ in range(writers)
+        ] + [
+            threading.Thread(target=loop, args=(lambda: read_orders(session_factory), read_timings))
+            for _ in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return write_timings, read_timings, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'profile':<12}{'orders/s':>10}{'errors':>8}{'write p50':>11}{'write p95':>11}"
+        f"{'reads/s':>9}{'read p95':>10}"
+    )
+    for profile in PROFILES:
+        writes, reads, errors = run_profile(profile, args.writers, args.readers, args.seconds)
+        print(
+            f"{profile:<12}{len(writes) / args.seconds:>10.0f}{errors:>8}"
+            f"{statistics.median(writes) if writes else float('nan'):>11.2f}{percentile(writes, 0.95):>11.2f}"
+            f"{len(reads) / args.seconds:>9.0f}{percentile(reads, 0.95):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""!
+@file bench_suite.py
+@brief Zestaw benchmarków API bez modelu: przepustowość i p50/p95/p99 przy kilku poziomach równoległości.
+
+Aplikacja działa w procesie (httpx.ASGITransport) w katalogu tymczasowym
+z własną bazą SQLite i katalogiem wizualizacji, a model zastępuje
+benchmarks/stub_pipeline.py ze sztucznym opóźnieniem. Scenariusze:
+GET /catalog, GET /flowers, POST /orders, GET /orders/{id},
+POST /api/visualization (każde żądanie to nowy skład, czyli renderowanie)
+i POST /api/visualization dla składu z pamięci podręcznej.
+Limity kontroli dopuszczania są domyślnie wyłączone, aby mierzyć model,
+a nie odrzucenia (można je włączyć zmiennymi środowiskowymi). Odpowiedzi
+wizualizacji z podglądem zamiast obrazu modelu (preview=true, np. po
+błędzie modelu) są liczone jako błędy.
+
+Wyniki trafiają do pliku JSON; --baseline porównuje je z poprzednim.
+
+Uruchomienie z katalogu głównego projektu:
+    python benchmarks/bench_suite.py --concurrency 1 8 32 --output results.json
+    python benchmarks/bench_suite.py --baseline results.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from _common import ROOT, percentile, temporary_database
+
+
+def sample_order(index):
+    return {
+        "pseudonim": f"bench-{index}",
+        "odbior": "dostawa",
+        "platnosc": "przelew",
+        "flowers": [{"id": 1 + index % 15, "quantity": 3}, {"id": 16 + index % 5, "quantity": 2}],
+        "papers": [{"id": 21 + index % 5}],
+        "ribbons": [{"id": 26 + index % 5}],
+    }
+
+
+def unique_compositions():
+    """!
+    @brief Generuje kolejne, niepowtarzalne składy bukietów (kwiat x zieleń x papier x wstążka x ilość).
+    """
+    for quantity in itertools.count(1):
+        for flower, foliage, paper, ribbon in itertools.product(range(1, 16), range(16, 21), range(21, 26), range(26, 31)):
+            yield {
+                "flowers": [{"id": flower, "quantity": quantity}, {"id": foliage, "quantity": 1}],
+                "papers": [{"id": paper}],
+                "ribbons": [{"id": ribbon}],
+            }
+
+
+async def measure(client, make_request, requests, concurrency, visualization=False):
+    """!
+    @brief Wykonuje requests żądań z zadaną równoległością.
+
+    @param visualization Czy liczyć odpowiedzi z podglądem (preview=true) jako błędy
+    @return Słownik z przepustowością, percentylami i kodami odpowiedzi
+    """
+    timings = []
+    statuses = Counter()
+    previews = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal previews
+        while next(counter) < requests:
+            start = time.perf_counter()
+            response = await make_request(client)
+            timings.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if visualization and response.status_code == 200 and response.json().get("preview"):
+                previews += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 2),
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+        "errors": sum(count for status, count in statuses.items() if status >= 400) + previews,
+        "previews": previews,
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run(args):
+    import httpx
+
+    import main
+
+    compositions = unique_compositions()
+    order_ids = []
+    order_counter = itertools.count()
+    read_counter = itertools.count()
+
+    async def create_order(client):
+        response = await client.post("/orders", json=sample_order(next(order_counter)))
+        if response.status_code == 200:
+            order_ids.append(response.json()["order_id"])
+        return response
+
+    async def read_order(client):
+        return await client.get(f"/orders/{order_ids[next(read_counter) % len(order_ids)]}")
+
+    async def render(client):
+        return await client.post("/api/visualization", json=next(compositions))
+
+    cached_composition = sample_order(0)
+
+    async def render_cached(client):
+        return await client.post("/api/visualization", json=cached_composition)
+
+    scenarios = [
+        ("GET /catalog", lambda client: client.get("/catalog"), args.requests, False),
+        ("GET /flowers", lambda client: client.get("/flowers"), args.requests, False),
+        ("POST /orders", create_order, args.requests, False),
+        ("GET /orders/{id}", read_order, args.requests, False),
+        ("POST /api/visualization (render)", render, args.render_requests, True),
+        ("POST /api/visualization (cached)", render_cached, args.requests, True),
+    ]
+
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # Ładowanie zaślepki i pierwsze renderowanie nie wchodzą do pomiarów
+            warmup = await client.post("/api/visualization", json=cached_composition)
+            warmup.raise_for_status()
+            if warmup.json()["preview"]:
+                raise SystemExit("model render failed (preview returned), see the log above")
+            for name, make_request, requests, visualization in scenarios:
+                for concurrency in args.concurrency:
+                    result = await measure(client, make_request, requests, concurrency, visualization)
+                    results.append({"scenario": name, "concurrency": concurrency, **result})
+                    print(
+                        f"{name:<34}{concurrency:>6}{result['throughput_rps']:>10.1f}"
+                        f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['errors']:>8}"
+                    )
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    baseline = {
+        (entry["scenario"], entry["concurrency"]): entry
+        for entry in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]
+    }
+    print(f"\nvs {baseline_path}")
+    print(f"{'scenario':<34}{'conc':>6}{'rps':>10}{'p95':>10}")
+    for entry in results:
+        previous = baseline.get((entry["scenario"], entry["concurrency"]))
+        if previous is None:
+            continue
+        rps = (entry["throughput_rps"] / previous["throughput_rps"] - 1) * 100
+        p95 = (entry["p95_ms"] / previous["p95_ms"] - 1) * 100 if previous["p95_ms"] else 0.0
+        print(f"{entry['scenario']:<34}{entry['concurrency']:>6}{rps:>+9.1f}%{p95:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="żądania na scenariusz i poziom równoległości")
+    parser.add_argument("--render-requests", type=int, default=64, help="żądania renderowania na poziom równoległości")
+    parser.add_argument("--call-ms", type=float, default=300.0, help="opóźnienie wywołania zaślepki modelu")
+    parser.add_argument("--image-ms", type=float, default=100.0, help="dodatkowe opóźnienie na obraz w partii")
+    parser.add_argument("--encode-ms", type=float, default=10.0, help="opóźnienie kodera tekstu")
+    parser.add_argument("--output", default="bench_suite.json", help="plik wyników JSON")
+    parser.add_argument("--baseline", help="poprzedni plik wyników do porównania")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+    os.environ.update({
+        "VISUALIZATION_PIPELINE_LOADER": "benchmarks.stub_pipeline:load",
+        "STUB_PIPELINE_CALL_MS": str(args.call_ms),
+        "STUB_PIPELINE_IMAGE_MS": str(args.image_ms),
+        "STUB_PIPELINE_ENCODE_MS": str(args.encode_ms),
+    })
+    os.environ.setdefault("VISUALIZATION_QUEUE_DEPTH", "0")
+    os.environ.setdefault("VISUALIZATION_CLIENT_CONCURRENCY", "0")
+
+    # Wizualizacje, warianty zdjęć i baza powstają w katalogu tymczasowym
+    with temporary_database(workdir=True):
+        print(f"{'scenario':<34}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        results = asyncio.run(run(args))
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "render_requests": args.render_requests,
+            "stub_call_ms": args.call_ms,
+            "stub_image_ms": args.image_ms,
+            "stub_encode_ms": args.encode_ms,
+            "visualization_workers": os.getenv("VISUALIZATION_WORKERS", "1"),
+            "batch_window_ms": os.getenv("VISUALIZATION_BATCH_WINDOW_MS", "25"),
+            "max_batch": os.getenv("VISUALIZATION_MAX_BATCH", "4"),
+        },
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
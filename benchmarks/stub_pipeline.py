@@ -0,0 +1,85 @@
+"""!
+@file stub_pipeline.py
+@brief Zaślepka OVStableDiffusionPipeline ze sztucznym opóźnieniem do benchmarków bez modelu.
+
+Udostępnia te same wywołania, których używa visualization.py (compile,
+encode_prompt, __call__ z prompt lub prompt_embeds i generator), a zamiast
+inferencji czeka zadany czas i zwraca jednolite obrazy w kolorze zależnym
+od promptu. Metoda seed_generator zwraca samo ziarno, więc zaślepka nie
+wymaga torch, a __call__ przyjmuje dowolny generator. Włączana zmienną:
+    VISUALIZATION_PIPELINE_LOADER=benchmarks.stub_pipeline:load
+
+Opóźnienia (zmienne środowiskowe, milisekundy):
+    STUB_PIPELINE_CALL_MS - stały koszt wywołania modelu (domyślnie 300)
+    STUB_PIPELINE_IMAGE_MS - dodatkowy koszt każdego obrazu w partii (domyślnie 100)
+    STUB_PIPELINE_ENCODE_MS - koszt kodera tekstu na wywołanie (domyślnie 10)
+"""
+
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+
+import numpy
+from PIL import Image
+
+
+## Wymiary osadzenia promptu kodera tekstu CLIP (tokeny, wymiar)
+EMBEDDING_SHAPE = (77, 768)
+
+
+class StubPipeline:
+    """!
+    @brief Pipeline zwracający jednolite obrazy po stałym opóźnieniu.
+    """
+
+    def __init__(self, call_ms: float, image_ms: float, encode_ms: float):
+        self.call_ms = call_ms
+        self.image_ms = image_ms
+        self.encode_ms = encode_ms
+        self.device = "cpu"
+        self.calls = 0
+
+    def compile(self):
+        pass
+
+    def seed_generator(self, seed: int) -> int:
+        return seed
+
+    def encode_prompt(self, prompts, device, num_images_per_prompt, do_classifier_free_guidance):
+        time.sleep(self.encode_ms / 1000)
+        embeddings = numpy.stack([self._embedding(prompt) for prompt in prompts])
+        return embeddings, None
+
+    def __call__(self, prompt=None, prompt_embeds=None, generator=None, width=512, height=512, **kwargs):
+        if prompt_embeds is not None:
+            seeds = [float(embedding[0, 0]) for embedding in prompt_embeds]
+        else:
+            prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+            seeds = [float(self._embedding(text)[0, 0]) for text in prompts]
+        time.sleep((self.call_ms + self.image_ms * len(seeds)) / 1000)
+        self.calls += 1
+        images = [Image.new("RGB", (width, height), self._color(seed)) for seed in seeds]
+        return SimpleNamespace(images=images)
+
+    @staticmethod
+    def _embedding(prompt: str):
+        embedding = numpy.zeros(EMBEDDING_SHAPE, dtype=numpy.float32)
+        embedding[0, 0] = int(hashlib.sha256(prompt.encode()).hexdigest()[:6], 16)
+        return embedding
+
+    @staticmethod
+    def _color(seed: float) -> tuple:
+        value = int(seed)
+        return (value >> 16 & 0xFF, value >> 8 & 0xFF, value & 0xFF)
+
+
+def load(model_id: str) -> StubPipeline:
+    """!
+    @brief Tworzy zaślepkę zamiast pipeline'u model_id (funkcja dla VISUALIZATION_PIPELINE_LOADER).
+    """
+    return StubPipeline(
+        call_ms=float(os.getenv("STUB_PIPELINE_CALL_MS", "300")),
+        image_ms=float(os.getenv("STUB_PIPELINE_IMAGE_MS", "100")),
+        encode_ms=float(os.getenv("STUB_PIPELINE_ENCODE_MS", "10"))
+    )
@@ -0,0 +1,196 @@
+"""!
+@file catalog.py
+@brief Migawka katalogu produktów przechowywana w pamięci jako gotowe odpowiedzi JSON.
+
+Tabela products zmienia się bardzo rzadko, więc listy produktów są
+serializowane raz i serwowane jako bajty z silnym ETagiem. Migawka zawiera
+też indeks (kategoria, nazwa) -> plik zdjęcia. Jest unieważniana po
+zatwierdzeniu transakcji zmieniającej produkty.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from models import Product
+from product_images import image_file
+
+
+## Kategorie produktów i odpowiadające im klucze/ścieżki katalogu
+CATEGORIES = {
+    "flower": "flowers",
+    "foliage": "foliage",
+    "paper": "papers",
+    "ribbon": "ribbons",
+}
+
+
+def _serialize(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def product_to_dict(product: Product) -> dict:
+    """!
+    @brief Zamienia produkt na słownik w formacie list katalogu.
+    """
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "image": f"/images/{product.image}",
+        "thumbnail": f"/images/{product.image}?w=256",
+        "max_quantity": product.max_quantity
+    }
+
+
+class CatalogSnapshot:
+    """!
+    @brief Niezmienna migawka katalogu: zserializowane listy i ich ETagi.
+    """
+
+    def __init__(self, products: list):
+        """!
+        @param products Lista produktów (obiektów Product) uporządkowana po ID
+        """
+        groups = {key: [] for key in CATEGORIES.values()}
+        ## (klucz kategorii, nazwa produktu) -> metadane pliku zdjęcia lub None
+        self.images = {}
+        for product in products:
+            key = CATEGORIES.get(product.category)
+            if key is not None:
+                groups[key].append(product_to_dict(product))
+                self.images.setdefault((key, product.name), image_file(product.image))
+
+        ## klucz kategorii (flowers, foliage, papers, ribbons, all) -> (bajty JSON, ETag)
+        self.bodies: Dict[str, tuple] = {}
+        for key, items in groups.items():
+            body = _serialize(items)
+            self.bodies[key] = (body, _etag(body))
+        body = _serialize(groups)
+        self.bodies["all"] = (body, _etag(body))
+
+
+class Catalog:
+    """!
+    @brief Dostęp do aktualnej migawki katalogu z leniwą przebudową po zmianach.
+    """
+
+    def __init__(self, session_factory: sessionmaker, async_session_factory: Optional[async_sessionmaker] = None):
+        """!
+        @param session_factory Fabryka sesji używana do przebudowy migawki
+        @param async_session_factory Fabryka sesji asynchronicznych dla snapshot_async
+        """
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._built_version = -1
+
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_soft_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        changed = session.new | session.dirty | session.deleted
+        if any(isinstance(obj, Product) for obj in changed):
+            session.info["catalog_changed"] = True
+
+    def _after_commit(self, session):
+        if session.info.pop("catalog_changed", False):
+            self.invalidate()
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop("catalog_changed", None)
+
+    def invalidate(self):
+        """!
+        @brief Oznacza migawkę jako nieaktualną; zostanie przebudowana przy następnym odczycie.
+        """
+        with self._lock:
+            self._version += 1
+
+    def _install(self, products: list, version: int) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(products)
+        with self._lock:
+            self._snapshot = snapshot
+            self._built_version = version
+        return snapshot
+
+    def _is_stale(self) -> bool:
+        return self._snapshot is None or self._built_version != self._version
+
+    def rebuild(self) -> CatalogSnapshot:
+        """!
+        @brief Odczytuje produkty z bazy i podmienia migawkę.
+
+        @return Nowa migawka katalogu
+        """
+        with self._lock:
+            version = self._version
+        db = self._session_factory()
+        try:
+            products = db.query(Product).order_by(Product.id).all()
+        finally:
+            db.close()
+        return self._install(products, version)
+
+    async def rebuild_async(self) -> CatalogSnapshot:
+        """!
+        @brief Odczytuje produkty sesją asynchroniczną i podmienia migawkę.
+
+        @return Nowa migawka katalogu
+        """
+        with self._lock:
+            version = self._version
+        async with self._async_session_factory() as db:
+            products = (await db.execute(select(Product).order_by(Product.id))).scalars().all()
+        return self._install(products, version)
+
+    def snapshot(self) -> CatalogSnapshot:
+        """!
+        @brief Zwraca aktualną migawkę, przebudowując ją po zmianach produktów.
+        """
+        return self.rebuild() if self._is_stale() else self._snapshot
+
+    async def snapshot_async(self) -> CatalogSnapshot:
+        """!
+        @brief Jak snapshot, ale przebudowa nie blokuje pętli zdarzeń.
+        """
+        return await self.rebuild_async() if self._is_stale() else self._snapshot
+
+    def image(self, collection: str, name: str):
+        """!
+        @brief Wyszukuje zdjęcie produktu w indeksie (kategoria, nazwa).
+
+        @param collection flowers, foliage, papers lub ribbons
+        @param name Nazwa produktu
+        @return Krotka (czy produkt istnieje, ImageFile lub None)
+        """
+        images = self.snapshot().images
+        key = (collection, name)
+        return key in images, images.get(key)
+
+    def body(self, key: str) -> tuple:
+        """!
+        @brief Zwraca zserializowaną listę i jej ETag.
+
+        @param key flowers, foliage, papers, ribbons lub all
+        @return Para (bajty JSON, ETag)
+        """
+        return self.snapshot().bodies[key]
+
+    async def body_async(self, key: str) -> tuple:
+        """!
+        @brief Asynchroniczny odpowiednik body.
+        """
+        return (await self.snapshot_async()).bodies[key]
@@ -0,0 +1,187 @@
+"""!
+@file composite.py
+@brief Natychmiastowy podgląd bukietu składany ze zdjęć produktów, bez modelu.
+
+Tłem jest zdjęcie papieru, na nim okrągłe miniatury kwiatów ułożone
+spiralnie (po jednej na sztukę, do MAX_STEMS), a u dołu miniatury wstążek.
+Miniatury powstają z pomniejszonych wariantów product_images, więc złożenie
+podglądu trwa milisekundy. Podglądy są przechowywane w pamięci podręcznej
+kluczowanej składem bukietu, tak jak wizualizacje modelu.
+"""
+
+import asyncio
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+from PIL import Image, ImageDraw
+
+import product_images
+from image_encoding import IMAGE_EXTENSIONS, encode_image
+from visualization_cache import VisualizationCache, composition_key
+
+
+## Katalog przechowywania podglądów
+PREVIEW_DIR = Path("static/previews")
+PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+
+## Ścieżka URL, pod którą serwowane są pliki z PREVIEW_DIR
+PREVIEW_URL = "/static/previews"
+
+## Bok kwadratowego podglądu w pikselach
+PREVIEW_SIZE = 512
+
+## Wersja układu podglądu (wchodzi w skład klucza, zmiana unieważnia zapisane podglądy)
+LAYOUT_VERSION = 1
+
+## Maksymalna liczba rysowanych miniatur kwiatów (większe ilości są skalowane proporcjonalnie)
+MAX_STEMS = 30
+
+## Kolor tła bukietu bez papieru
+BACKGROUND_COLOR = (247, 243, 238)
+
+## Pamięć podręczna podglądów (PREVIEW_CACHE_DISK_MB)
+preview_cache = VisualizationCache(
+    PREVIEW_DIR,
+    disk_bytes=int(float(os.getenv("PREVIEW_CACHE_DISK_MB", "256")) * 1024 * 1024),
+    max_age=float(os.getenv("VISUALIZATION_CACHE_MAX_AGE_HOURS", "168")) * 3600
+)
+
+
+def _source(item: dict) -> Optional[Path]:
+    icon = item.get("icon")
+    return product_images.source_path(os.path.basename(icon)) if icon else None
+
+
+def _square(path: Path, size: int) -> Image.Image:
+    """!
+    @brief Wczytuje wariant zdjęcia produktu przycięty do kwadratu o boku size.
+    """
+    width = product_images.snap_width(size)
+    with Image.open(product_images.variant_path(path, width, "jpeg")) as image:
+        image = image.convert("RGB")
+    side = min(image.size)
+    left = (image.width - side) // 2
+    top = (image.height - side) // 2
+    return image.crop((left, top, left + side, top + side)).resize((size, size), Image.LANCZOS)
+
+
+@lru_cache(maxsize=256)
+def _tile(path: Path, mtime: float, diameter: int) -> Image.Image:
+    """!
+    @brief Zwraca okrągłą miniaturę produktu z białą obwódką (RGBA).
+
+    @param mtime Czas modyfikacji oryginału - część klucza lru_cache
+    """
+    border = max(2, diameter // 40)
+    scale = 4
+    mask = Image.new("L", (diameter * scale, diameter * scale), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, diameter * scale - 1, diameter * scale - 1), fill=255)
+    outer = mask.resize((diameter, diameter), Image.LANCZOS)
+
+    mask = Image.new("L", (diameter * scale, diameter * scale), 0)
+    draw = ImageDraw.Draw(mask)
+    inset = border * scale
+    draw.ellipse((inset, inset, diameter * scale - 1 - inset, diameter * scale - 1 - inset), fill=255)
+    inner = mask.resize((diameter, diameter), Image.LANCZOS)
+
+    tile = Image.new("RGBA", (diameter, diameter), (255, 255, 255, 0))
+    tile.paste((255, 255, 255, 255), mask=outer)
+    tile.paste(_square(path, diameter), mask=inner)
+    return tile
+
+
+def _paste_tile(canvas: Image.Image, path: Path, diameter: int, center: tuple):
+    tile = _tile(path, path.stat().st_mtime, diameter)
+    canvas.alpha_composite(tile, (int(center[0] - diameter / 2), int(center[1] - diameter / 2)))
+
+
+def _stems(flowers: List[dict]) -> List[Path]:
+    """!
+    @brief Rozwija pozycje kwiatów w listę miniatur (po jednej na sztukę, najwyżej MAX_STEMS).
+
+    Rodzaje są przeplatane, aby kwiaty jednego rodzaju nie tworzyły skupisk.
+    """
+    items = [(path, flower["quantity"]) for flower in flowers if (path := _source(flower))]
+    total = sum(quantity for _, quantity in items)
+    if total > MAX_STEMS:
+        items = [(path, max(1, round(quantity * MAX_STEMS / total))) for path, quantity in items]
+    stems = []
+    for round_index in range(max((quantity for _, quantity in items), default=0)):
+        stems.extend(path for path, quantity in items if quantity > round_index)
+    return stems
+
+
+def render_preview(order_data: dict) -> Image.Image:
+    """!
+    @brief Składa podgląd bukietu ze zdjęć produktów.
+
+    @param order_data Słownik zawierający listy: flowers (icon, quantity), papers (icon), ribbons (icon)
+    @return Obraz RGB PREVIEW_SIZE x PREVIEW_SIZE
+    """
+    size = PREVIEW_SIZE
+    papers = [path for path in map(_source, order_data.get("papers", [])) if path]
+    if papers:
+        background = _square(papers[0], size)
+        # Rozjaśnienie papieru, aby miniatury kwiatów były dobrze widoczne
+        canvas = Image.blend(background, Image.new("RGB", (size, size), BACKGROUND_COLOR), 0.35).convert("RGBA")
+    else:
+        canvas = Image.new("RGBA", (size, size), BACKGROUND_COLOR + (255,))
+
+    stems = _stems(order_data.get("flowers", []))
+    if stems:
+        # Układ spiralny (phyllotaxis): kolejne miniatury co złoty kąt, promień rośnie jak sqrt(i)
+        radius = min(size * 0.33, size * 0.12 * math.sqrt(len(stems)))
+        step = radius / math.sqrt(max(len(stems) - 1, 1))
+        diameter = int(min(size * 0.42, max(size * 0.11, step * 2.3)))
+        center = (size / 2, size * 0.44)
+        golden_angle = math.pi * (3 - math.sqrt(5))
+        for index in reversed(range(len(stems))):
+            distance = step * math.sqrt(index)
+            angle = index * golden_angle
+            position = (center[0] + distance * math.cos(angle), center[1] + distance * math.sin(angle))
+            _paste_tile(canvas, stems[index], diameter, position)
+
+    ribbons = [path for path in map(_source, order_data.get("ribbons", [])) if path]
+    if ribbons:
+        diameter = int(size * 0.2)
+        spacing = diameter * 0.8
+        start = size / 2 - spacing * (len(ribbons) - 1) / 2
+        for index, path in enumerate(ribbons):
+            _paste_tile(canvas, path, diameter, (start + spacing * index, size * 0.84))
+
+    return canvas.convert("RGB")
+
+
+def preview(order_data: dict, image_format: str, quality: Optional[int]) -> str:
+    """!
+    @brief Zwraca nazwę pliku podglądu, składając go, jeśli nie ma go w pamięci podręcznej.
+
+    @param order_data Słownik zawierający listy: flowers, papers, ribbons
+    @param image_format png, jpeg lub webp
+    @param quality Jakość kodowania JPEG/WebP
+    @return Nazwa pliku w PREVIEW_DIR
+    """
+    key = composition_key(order_data, {"preview": LAYOUT_VERSION, "format": image_format, "quality": quality})
+    name = preview_cache.lookup(key)
+    if name is not None:
+        return name
+    data = encode_image(render_preview(order_data), image_format, quality)
+    return preview_cache.put(key, data, IMAGE_EXTENSIONS[image_format])
+
+
+async def preview_url(order_data: dict, image_format: str, quality: Optional[int]) -> str:
+    """!
+    @brief Zwraca URL podglądu bukietu, składając go w domyślnej puli wątków.
+
+    @param order_data Słownik zawierający listy: flowers, papers, ribbons
+    @param image_format png, jpeg lub webp
+    @param quality Jakość kodowania JPEG/WebP
+    @return URL pliku w PREVIEW_URL
+    """
+    loop = asyncio.get_running_loop()
+    name = await loop.run_in_executor(None, preview, order_data, image_format, quality)
+    return f"{PREVIEW_URL}/{name}"
@@ -1,24 +1,207 @@
 """!
 @file database.py
 @brief Konfiguracja połączenia z bazą danych SQLite.
+
+Adres bazy, pula połączeń i profil SQLite pochodzą ze zmiennych
+środowiskowych (patrz readme.md, sekcja Konfiguracja).
 """
 
-from sqlalchemy import create_engine
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+load_dotenv()
+
+
+## URL połączenia do bazy danych (zmienna DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./flowers.db")
+
+## Profil połączeń SQLite: production (WAL i pragmy poniżej) lub default (ustawienia SQLite)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+
+## Pragmy ustawiane na każdym połączeniu w profilu production
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+    "cache_size": -int(os.getenv("SQLITE_CACHE_MB", "64")) * 1024,
+    "temp_store": "MEMORY",
+}
+
+## Ustawienia puli połączeń (zmienne DATABASE_POOL_*)
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DATABASE_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "30")),
+    "pool_pre_ping": os.getenv("DATABASE_POOL_PRE_PING", "0") == "1",
+}
+
 
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
 
-## URL połączenia do bazy danych SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./flowers.db"
+
+def _engine_options(url, profile: str) -> dict:
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if profile == "production":
+            options["connect_args"]["timeout"] = SQLITE_PRAGMAS["busy_timeout"] / 1000
+    if not _is_memory_sqlite(url):
+        options.update(POOL_OPTIONS)
+    return options
+
+
+def _install_pragmas(database_engine: Engine, url, profile: str):
+    if url.get_backend_name() != "sqlite" or profile != "production" or _is_memory_sqlite(url):
+        return
+
+    @event.listens_for(database_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_database_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = SQLITE_PROFILE) -> Engine:
+    """!
+    @brief Tworzy silnik SQLAlchemy z ustawieniami puli i profilem połączeń SQLite.
+
+    W profilu production każde nowe połączenie SQLite dostaje pragmy z
+    SQLITE_PRAGMAS: WAL pozwala czytać w trakcie zapisu, a busy_timeout
+    każe czekać na blokadę zapisu zamiast od razu zgłaszać "database is locked".
+
+    @param url URL bazy danych
+    @param profile production lub default
+    @return Silnik bazy danych
+    """
+    parsed = make_url(url)
+    database_engine = create_engine(url, **_engine_options(parsed, profile))
+    _install_pragmas(database_engine, parsed, profile)
+    return database_engine
+
+
+def async_database_url(url: str) -> str:
+    """!
+    @brief Zamienia URL bazy na wariant z asynchronicznym sterownikiem (sqlite -> sqlite+aiosqlite).
+    """
+    parsed = make_url(url)
+    if parsed.drivername == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+def create_async_database_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = SQLITE_PROFILE) -> AsyncEngine:
+    """!
+    @brief Tworzy asynchroniczny silnik SQLAlchemy (aiosqlite) z tymi samymi ustawieniami co create_database_engine.
+
+    @param url URL bazy danych (sterownik sqlite jest zamieniany na aiosqlite)
+    @param profile production lub default
+    @return Asynchroniczny silnik bazy danych
+    """
+    parsed = make_url(async_database_url(url))
+    options = _engine_options(parsed, profile)
+    if not _is_memory_sqlite(parsed):
+        options["poolclass"] = AsyncAdaptedQueuePool
+    database_engine = create_async_engine(parsed, **options)
+    _install_pragmas(database_engine.sync_engine, parsed, profile)
+    return database_engine
 
 
 ## Silnik bazy danych SQLAlchemy
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_database_engine()
+
+## Asynchroniczny silnik bazy danych (ta sama baza, sterownik aiosqlite)
+async_engine = create_async_database_engine()
+
+def add_missing_columns(bind: Engine, metadata: MetaData):
+    """!
+    @brief Dodaje do istniejących tabel kolumny zdefiniowane w modelach, których brakuje w bazie.
+
+    create_all tworzy tylko brakujące tabele. Nowe kolumny muszą dopuszczać
+    NULL, bo istniejące wiersze nie mają dla nich wartości.
+
+    @param bind Silnik bazy danych
+    @param metadata Metadane modeli
+    """
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+
+class QueryCounter:
+    """!
+    @brief Licznik zapytań SQL wykonanych w ramach jednego żądania.
+    """
+    
+    def __init__(self):
+        ## Liczba wykonanych poleceń SQL
+        self.count = 0
+        ## Łączny czas wykonania poleceń SQL w sekundach
+        self.seconds = 0.0
+
+
+## Licznik bieżącego żądania (None poza track_queries)
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    starts = conn.info.get("query_start")
+    if counter is not None and starts:
+        counter.seconds += time.perf_counter() - starts.pop()
+
+
+@contextmanager
+def track_queries():
+    """!
+    @brief Zlicza zapytania SQL wykonane w bieżącym kontekście (również w wątkach
+           puli, do których kontekst jest kopiowany).
+    
+    @yield Obiekt QueryCounter
+    """
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
 
 ## Fabryka sesji bazodanowych
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+## Fabryka asynchronicznych sesji bazodanowych
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     """!
@@ -32,3 +215,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """!
+    @brief Tworzy asynchroniczną sesję bazodanową dla endpointów FastAPI.
+
+    Endpointy z tą zależnością są funkcjami async i nie zajmują wątków puli.
+
+    @yield Sesja AsyncSession
+    @note Sesja jest automatycznie zamykana po użyciu
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,206 @@
+"""!
+@file http_cache.py
+@brief Nagłówki i odpowiedzi HTTP związane z buforowaniem po stronie klienta.
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+
+
+## Nagłówek Cache-Control dla zasobów o niezmiennej treści pod danym URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+## Nagłówek Cache-Control dla zasobów rzadko zmienianych, rewalidowanych ETagiem po wygaśnięciu
+LONG_CACHE_CONTROL = "public, max-age=31536000"
+
+## Nagłówek Cache-Control dla zasobów, które klient musi rewalidować ETagiem
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """!
+    @brief Sprawdza, czy nagłówek If-None-Match obejmuje podany ETag.
+
+    @param request Żądanie HTTP
+    @param etag ETag zasobu (w cudzysłowach)
+    @return True, jeśli klient ma aktualną kopię
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def etag_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str = "application/json",
+    cache_control: str = REVALIDATE_CACHE_CONTROL
+) -> Response:
+    """!
+    @brief Zwraca gotowe bajty z ETagiem albo 304, jeśli klient ma aktualną kopię.
+
+    @param request Żądanie HTTP
+    @param body Zserializowana treść odpowiedzi
+    @param etag ETag treści
+    @param media_type Typ MIME treści
+    @param cache_control Wartość nagłówka Cache-Control
+    @return Odpowiedź 200 z treścią lub 304 bez treści
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """!
+    @brief Wyznacza ETag pliku na podstawie czasu modyfikacji i rozmiaru.
+    """
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """!
+    @brief Sprawdza nagłówki warunkowe If-None-Match i If-Modified-Since.
+
+    If-Modified-Since jest brany pod uwagę tylko bez If-None-Match (RFC 9110).
+
+    @param request Żądanie HTTP
+    @param etag ETag zasobu
+    @param mtime Czas modyfikacji zasobu (timestamp)
+    @return True, jeśli klient ma aktualną kopię
+    """
+    if "if-none-match" in request.headers:
+        return etag_matches(request, etag)
+    since = request.headers.get("if-modified-since")
+    if since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_file_response(
+    request: Request,
+    path: Path,
+    media_type: Optional[str] = None,
+    cache_control: str = LONG_CACHE_CONTROL,
+    headers: Optional[dict] = None
+) -> Response:
+    """!
+    @brief Zwraca plik z ETagiem i Last-Modified albo 304 dla aktualnej kopii klienta.
+
+    @param request Żądanie HTTP
+    @param path Ścieżka pliku
+    @param media_type Typ MIME (domyślnie odgadywany z rozszerzenia)
+    @param cache_control Wartość nagłówka Cache-Control
+    @param headers Dodatkowe nagłówki (np. Vary)
+    @return FileResponse lub odpowiedź 304
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        **(headers or {}),
+    }
+    if not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=response_headers)
+    return FileResponse(path, media_type=media_type, headers=response_headers, stat_result=stat)
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple]:
+    """!
+    @brief Parsuje pojedynczy zakres "bytes=start-end" (także "start-" i "-suffix").
+
+    @return Para (start, end) włącznie, None dla nagłówka nieobsługiwanego
+            (np. wiele zakresów) albo (-1, -1) dla zakresu niespełnialnego
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return (-1, -1)
+            return (max(0, size - length), size - 1)
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size or last < first:
+        return (-1, -1)
+    return (first, min(last, size - 1))
+
+
+def bytes_response(
+    request: Request,
+    data: bytes,
+    etag: str,
+    mtime: float,
+    media_type: str,
+    cache_control: str = LONG_CACHE_CONTROL
+) -> Response:
+    """!
+    @brief Zwraca treść z pamięci z obsługą 304 oraz żądań Range (206/416).
+
+    @param request Żądanie HTTP
+    @param data Pełna treść zasobu
+    @param etag ETag zasobu
+    @param mtime Czas modyfikacji zasobu (timestamp)
+    @param media_type Typ MIME
+    @param cache_control Wartość nagłówka Cache-Control
+    @return Odpowiedź 200, 206, 304 lub 416
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, len(data))
+        if byte_range == (-1, -1):
+            headers["Content-Range"] = f"bytes */{len(data)}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """!
+    @brief Montowanie plików statycznych adresowanych treścią.
+
+    Nazwa pliku jest skrótem jego zawartości, więc klient może go
+    przechowywać bezterminowo. ETag i Last-Modified ustawia StaticFiles.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
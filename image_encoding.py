@@ -0,0 +1,36 @@
+"""!
+@file image_encoding.py
+@brief Kodowanie obrazów PIL do formatów PNG, JPEG i WebP.
+"""
+
+import io
+from typing import Optional
+
+
+## Rozszerzenia plików dla obsługiwanych formatów
+IMAGE_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+## Typy MIME dla obsługiwanych formatów
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def encode_image(image, image_format: str, quality: Optional[int]) -> bytes:
+    """!
+    @brief Koduje obraz PIL do wybranego formatu.
+
+    JPEG jest zapisywany jako progresywny, a PNG z niskim poziomem
+    kompresji, który jest znacznie szybszy przy niewielkiej różnicy rozmiaru.
+
+    @param image Obraz PIL
+    @param image_format png, jpeg lub webp
+    @param quality Jakość 1-100 (ignorowana dla PNG)
+    @return Zakodowany obraz
+    """
+    buffered = io.BytesIO()
+    if image_format == "jpeg":
+        image.convert("RGB").save(buffered, format="JPEG", quality=quality, progressive=True, optimize=True)
+    elif image_format == "webp":
+        image.save(buffered, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffered, format="PNG", compress_level=1)
+    return buffered.getvalue()
@@ -0,0 +1,197 @@
+"""!
+@file inference_server.py
+@brief Wspólny proces inferencji modelu wizualizacji dla wielu procesów API.
+
+Przy `uvicorn --workers N` każdy proces ładowałby własną kopię modelu.
+Zamiast tego model działa w jednym procesie serwera, a procesy API
+(VISUALIZATION_BACKEND=remote) przesyłają do niego żądania przez gniazdo
+Unix (multiprocessing.connection). Procesy API nie importują wtedy torch
+ani optimum. Serwer łączy żądania ze wszystkich procesów w partie tym
+samym planistą co tryb lokalny.
+
+Uruchomienie z katalogu głównego projektu:
+    python inference_server.py
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceError(Exception):
+    """!
+    @brief Zgłaszany, gdy serwer inferencji zwrócił błąd wykonania żądania.
+    """
+
+
+class InferenceClient:
+    """!
+    @brief Klient serwera inferencji z pulą połączeń wielokrotnego użytku.
+
+    Każde połączenie obsługuje jedno żądanie naraz, więc liczba połączeń
+    ogranicza liczbę renderowań, na które proces API czeka równocześnie.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, connections: int = 8, timeout: float = 120.0):
+        """!
+        @param address Ścieżka gniazda Unix serwera
+        @param authkey Wspólny klucz uwierzytelniania połączeń (None - bez uwierzytelniania)
+        @param connections Maksymalna liczba równoległych żądań
+        @param timeout Czas oczekiwania na odpowiedź w sekundach
+        """
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        ## Bezczynne połączenia gotowe do ponownego użycia
+        self._idle = queue.LifoQueue()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, connections), thread_name_prefix="inference-client")
+
+    def call(self, method: str, *args, timeout: Optional[float] = None):
+        """!
+        @brief Synchronicznie wykonuje metodę serwera.
+
+        @param method Nazwa metody: render lub status
+        @param args Argumenty metody
+        @param timeout Czas oczekiwania na odpowiedź (domyślnie self.timeout)
+        @return Wynik metody
+        @throws InferenceError jeśli serwer zgłosił błąd
+        @throws TimeoutError jeśli odpowiedź nie nadeszła w czasie
+        @throws OSError jeśli serwer jest nieosiągalny
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        try:
+            conn.send((method, args))
+            if not conn.poll(self.timeout if timeout is None else timeout):
+                raise TimeoutError(f"Inference server did not answer '{method}' in time")
+            status, result = conn.recv()
+        except BaseException:
+            # Połączenie w nieznanym stanie (np. spóźniona odpowiedź) nie wraca do puli
+            conn.close()
+            raise
+        self._idle.put(conn)
+        if status == "error":
+            raise InferenceError(result)
+        return result
+
+    async def render(self, prompt: str, seed: int, generation_params: Optional[dict] = None) -> tuple:
+        """!
+        @brief Generuje obraz na serwerze bez blokowania pętli zdarzeń.
+
+        @param prompt Prompt wizualizacji
+        @param seed Ziarno szumu początkowego
+        @param generation_params Parametry generowania (None - bieżące GENERATION_PARAMS serwera)
+        @return Para (obraz PIL, raport żądania)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.call, "render", prompt, seed, generation_params)
+
+    def close(self):
+        """!
+        @brief Zamyka pulę wątków i bezczynne połączenia.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _handle_connection(conn, loop, visualization):
+    """!
+    @brief Obsługuje kolejne żądania jednego połączenia aż do jego zamknięcia.
+    """
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if method == "render":
+                    future = asyncio.run_coroutine_threadsafe(visualization.render_image(*args), loop)
+                    result = future.result()
+                elif method == "status":
+                    result = visualization.inference_status()
+                else:
+                    raise ValueError(f"Unknown method: {method}")
+            except Exception as e:
+                logger.error("Inference request '%s' failed: %s", method, e)
+                response = ("error", f"{type(e).__name__}: {e}")
+            else:
+                response = ("ok", result)
+            try:
+                conn.send(response)
+            except (EOFError, OSError):
+                return
+
+
+def serve(address: str, authkey: Optional[bytes] = None):
+    """!
+    @brief Uruchamia serwer inferencji i obsługuje połączenia do przerwania procesu.
+
+    @param address Ścieżka gniazda Unix
+    @param authkey Wspólny klucz uwierzytelniania połączeń
+    @note Gniazdo jest tworzone z prawami 0600, a bez authkey dostęp ma
+          tylko użytkownik uruchamiający serwer.
+    """
+    import visualization
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="inference-loop", daemon=True).start()
+    if visualization.VISUALIZATION_WARMUP:
+        asyncio.run_coroutine_threadsafe(visualization.start_warmup(), loop)
+
+    if os.path.exists(address):
+        os.unlink(address)
+    previous_umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(previous_umask)
+    logger.info("Inference server listening on %s", address)
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Nieudane uwierzytelnienie klienta nie zatrzymuje serwera
+                logger.warning("Rejected inference connection: %s", e)
+                continue
+            threading.Thread(
+                target=_handle_connection,
+                args=(conn, loop, visualization),
+                name="inference-connection",
+                daemon=True
+            ).start()
+    finally:
+        listener.close()
+        visualization.shutdown_executor()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    # Serwer zawsze wykonuje inferencję sam, nawet przy VISUALIZATION_BACKEND=remote w .env
+    os.environ["VISUALIZATION_BACKEND"] = "local"
+    from visualization import INFERENCE_AUTHKEY, INFERENCE_SOCKET
+
+    try:
+        serve(INFERENCE_SOCKET, INFERENCE_AUTHKEY)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
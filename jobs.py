@@ -0,0 +1,273 @@
+"""!
+@file jobs.py
+@brief Kolejka asynchronicznych zadań generowania wizualizacji z trwałym stanem w SQLite.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from models import VisualizationJob
+
+logger = logging.getLogger(__name__)
+
+
+## Stany, po których zadanie nie zmienia się już
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class JobQueueFull(Exception):
+    """!
+    @brief Zgłaszany, gdy kolejka zadań osiągnęła maksymalną długość.
+    """
+
+
+class JobManager:
+    """!
+    @brief Ograniczona kolejka zadań wizualizacji obsługiwana przez pulę korutyn.
+
+    Stan każdego zadania jest zapisywany w tabeli visualization_jobs, dzięki
+    czemu wynik można odczytać przez odpytywanie lub strumień SSE. Zadania
+    oczekujące w chwili restartu są ponownie kolejkowane przy starcie.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        render: Callable[[dict], Awaitable[str]],
+        concurrency: int,
+        max_queue: int,
+        ttl: float
+    ):
+        """!
+        @param session_factory Fabryka sesji bazodanowych
+        @param render Korutyna przyjmująca parametry zadania i zwracająca URL obrazu
+        @param concurrency Liczba równolegle przetwarzanych zadań
+        @param max_queue Maksymalna liczba zadań oczekujących
+        @param ttl Czas życia wyniku zakończonego zadania w sekundach
+        """
+        self._session_factory = session_factory
+        self._render = render
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(1, max_queue)
+        self.ttl = ttl
+
+        self._queue = None
+        self._tasks = []
+        ## job_id -> None, w kolejności zgłoszenia (do wyznaczania pozycji)
+        self._pending = OrderedDict()
+        ## job_id -> lista kolejek subskrybentów SSE
+        self._subscribers = {}
+
+    async def start(self):
+        """!
+        @brief Uruchamia korutyny robocze, sprzątanie i wznawia przerwane zadania.
+        """
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        resumed = await loop.run_in_executor(None, self._resume_pending)
+        for job_id, params in resumed:
+            self._pending[job_id] = None
+            self._queue.put_nowait((job_id, params))
+
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+        self._tasks.append(loop.create_task(self._cleanup()))
+
+    async def stop(self):
+        """!
+        @brief Zatrzymuje korutyny robocze; niedokończone zadania zostaną wznowione po restarcie.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _resume_pending(self) -> list:
+        db = self._session_factory()
+        try:
+            jobs = (
+                db.query(VisualizationJob)
+                .filter(VisualizationJob.status.in_(["queued", "running"]))
+                .order_by(VisualizationJob.created_at)
+                .all()
+            )
+            resumed = []
+            for job in jobs:
+                if len(resumed) < self.max_queue:
+                    job.status = "queued"
+                    resumed.append((job.id, json.loads(job.order_data)))
+                else:
+                    self._finish(job, None, "Queue overflow after restart")
+            db.commit()
+            return resumed
+        finally:
+            db.close()
+
+    async def submit(self, params: dict) -> dict:
+        """!
+        @brief Zapisuje nowe zadanie i umieszcza je w kolejce.
+
+        @param params Argumenty przekazywane do funkcji render (m.in. zwalidowany skład bukietu)
+        @return Stan nowego zadania
+        @throws JobQueueFull jeśli kolejka jest pełna
+        """
+        if self._queue is None or self._queue.full():
+            raise JobQueueFull()
+
+        job_id = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._insert, job_id, params)
+
+        if self._queue.full():
+            await loop.run_in_executor(None, self._update, job_id, "failed", None, "Queue is full")
+            raise JobQueueFull()
+        self._pending[job_id] = None
+        self._queue.put_nowait((job_id, params))
+        return self._state(job_id, "queued")
+
+    def _insert(self, job_id: str, params: dict):
+        db = self._session_factory()
+        try:
+            db.add(VisualizationJob(id=job_id, status="queued", order_data=json.dumps(params)))
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(self, job: VisualizationJob, image_url: Optional[str], error: Optional[str]):
+        now = datetime.utcnow()
+        job.status = "failed" if error else "completed"
+        job.image_url = image_url
+        job.error = error
+        job.finished_at = now
+        job.expires_at = now + timedelta(seconds=self.ttl)
+
+    def _update(self, job_id: str, status: str, image_url: Optional[str] = None, error: Optional[str] = None):
+        db = self._session_factory()
+        try:
+            job = db.get(VisualizationJob, job_id)
+            if job is None:
+                return
+            if status in TERMINAL_STATUSES:
+                self._finish(job, image_url, error)
+            else:
+                job.status = status
+            db.commit()
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """!
+        @brief Odczytuje stan zadania.
+
+        @param job_id Identyfikator zadania
+        @return Stan zadania lub None, jeśli nie istnieje lub wygasło
+        """
+        db = self._session_factory()
+        try:
+            job = db.get(VisualizationJob, job_id)
+            if job is None or (job.expires_at is not None and job.expires_at < datetime.utcnow()):
+                return None
+            return self._state(job.id, job.status, job.image_url, job.error)
+        finally:
+            db.close()
+
+    def _state(self, job_id: str, status: str, image_url: Optional[str] = None, error: Optional[str] = None) -> dict:
+        state = {"job_id": job_id, "status": status, "imageUrl": image_url, "error": error}
+        if status == "queued" and job_id in self._pending:
+            state["position"] = list(self._pending).index(job_id) + 1
+        return state
+
+    def _publish(self, state: dict):
+        for queue in self._subscribers.get(state["job_id"], []):
+            queue.put_nowait(state)
+        if state["status"] == "running":
+            for job_id in [j for j in self._subscribers if j in self._pending]:
+                position_state = self._state(job_id, "queued")
+                for queue in self._subscribers.get(job_id, []):
+                    queue.put_nowait(position_state)
+
+    async def events(self, job_id: str) -> AsyncIterator[Optional[dict]]:
+        """!
+        @brief Strumień zmian stanu zadania, zakończony stanem końcowym.
+
+        @param job_id Identyfikator zadania
+        @return Asynchroniczny iterator stanów; None oznacza brak zmian w oknie heartbeat
+        """
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            loop = asyncio.get_running_loop()
+            state = await loop.run_in_executor(None, self.get, job_id)
+            if state is None:
+                return
+            yield state
+            while state["status"] not in TERMINAL_STATUSES:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if update != state:
+                    state = update
+                    yield state
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, params = await self._queue.get()
+            self._pending.pop(job_id, None)
+            try:
+                await loop.run_in_executor(None, self._update, job_id, "running")
+                self._publish(self._state(job_id, "running"))
+                try:
+                    image_url = await self._render(params)
+                except Exception as e:
+                    logger.exception("Zadanie wizualizacji %s nie powiodło się", job_id)
+                    await loop.run_in_executor(None, self._update, job_id, "failed", None, str(e))
+                    self._publish(self._state(job_id, "failed", error=str(e)))
+                else:
+                    await loop.run_in_executor(None, self._update, job_id, "completed", image_url)
+                    self._publish(self._state(job_id, "completed", image_url))
+            except Exception:
+                logger.exception("Błąd obsługi zadania wizualizacji %s", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _cleanup(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(60.0, self.ttl))
+            try:
+                await loop.run_in_executor(None, self._delete_expired)
+            except Exception:
+                logger.exception("Błąd usuwania wygasłych zadań")
+
+    def _delete_expired(self):
+        db = self._session_factory()
+        try:
+            db.query(VisualizationJob).filter(VisualizationJob.expires_at < datetime.utcnow()).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca długość kolejki i liczbę aktywnych subskrypcji.
+        """
+        return {
+            "queued": len(self._pending),
+            "max_queue": self.max_queue,
+            "concurrency": self.concurrency,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
@@ -4,17 +4,39 @@
 """
 
 from sqlite3 import IntegrityError
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.requests import HTTPConnection
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError as SQLAlchemyIntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, Dict, List, Literal, Optional
+from datetime import date, datetime
 import os
-from database import engine, get_db, SessionLocal
+from time import perf_counter
+import json
+import asyncio
+import logging
+from database import engine, async_engine, add_missing_columns, get_async_db, SessionLocal, AsyncSessionLocal, track_queries
 from models import *
-from visualization import generate_bouquet_visualization
+from visualization import generate_bouquet_visualization, shutdown_executor, cache as visualization_cache
+from admission import AdmissionRejected
+import visualization
+import composite
+from jobs import JobManager, JobQueueFull
+from http_cache import ImmutableStaticFiles, etag_response, cached_file_response, bytes_response, not_modified
+import product_images
+import metrics
+import sales
+from catalog import CATEGORIES, Catalog
+from image_encoding import MEDIA_TYPES
+from order_listing import InvalidCursor, order_filters, page_order_keys, export_rows, to_csv, to_ndjson, chunked
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 app = FastAPI()
 
@@ -35,9 +57,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/images", StaticFiles(directory="images"), name="images")
+@app.middleware("http")
+async def query_count_header(request: Request, call_next):
+    """!
+    @brief Dodaje do odpowiedzi nagłówek X-Query-Count z liczbą zapytań SQL żądania
+           i zapisuje metryki żądania (liczba, czas, zapytania SQL) dla /metrics.
+    
+    Metryki są etykietowane szablonem ścieżki (np. /orders/{order_id}), a nie
+    konkretnym adresem, więc liczba serii nie rośnie z liczbą zasobów.
+    """
+    start = perf_counter()
+    with track_queries() as counter:
+        response = await call_next(request)
+    elapsed = perf_counter() - start
+    response.headers["X-Query-Count"] = str(counter.count)
+    
+    route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+    metrics.http_requests.inc(method=request.method, route=route, status=response.status_code)
+    metrics.http_request_duration.observe(elapsed, method=request.method, route=route)
+    metrics.http_request_queries.observe(counter.count, route=route)
+    metrics.http_request_query_duration.observe(counter.seconds, route=route)
+    return response
+
+
+app.mount(
+    visualization.IMAGES_URL,
+    ImmutableStaticFiles(directory=visualization.IMAGES_DIR),
+    name="visualizations"
+)
+
+app.mount(
+    composite.PREVIEW_URL,
+    ImmutableStaticFiles(directory=composite.PREVIEW_DIR),
+    name="previews"
+)
 
 Base.metadata.create_all(bind=engine)
+# create_all pomija kolumny i indeksy istniejących tabel, więc dodajemy brakujące osobno
+add_missing_columns(engine, Base.metadata)
+for index in Order.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
+async def render_visualization_job(params: dict) -> str:
+    """!
+    @brief Wykonuje zadanie z kolejki wizualizacji.
+    
+    @param params Argumenty generate_bouquet_visualization (order_data, image_format, quality)
+    @return URL wygenerowanego obrazu
+    """
+    return await generate_bouquet_visualization(**params)
+
+
+## Migawka katalogu produktów serwowana z pamięci
+catalog = Catalog(SessionLocal, AsyncSessionLocal)
+
+
+## Kolejka asynchronicznych zadań wizualizacji
+job_manager = JobManager(
+    SessionLocal,
+    render_visualization_job,
+    concurrency=int(os.getenv("VISUALIZATION_JOB_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("VISUALIZATION_JOB_QUEUE_SIZE", "100")),
+    ttl=float(os.getenv("VISUALIZATION_JOB_TTL_SECONDS", "3600"))
+)
 
 
 @app.on_event("startup")
@@ -46,7 +128,8 @@ def startup_event():
     @brief Inicjalizuje bazę danych przykładowymi produktami przy starcie aplikacji.
     
     Funkcja dodaje do bazy 15 kwiatów, 5 rodzajów zieleni, 5 papierów i 5 wstążek,
-    jeśli baza jest pusta.
+    jeśli baza jest pusta, uzupełnia ceny i podsumowania sprzedaży starszych
+    zamówień, a następnie buduje migawkę katalogu.
     """
     db = SessionLocal()
     try:
@@ -101,10 +184,51 @@ def startup_event():
                 db.add(item)
             db.commit()
             print("Database initialized with 15 flowers, 5 foliage, 5 papers, and 5 ribbons.")
+        sales.backfill(db)
     except IntegrityError:
         db.rollback()
     finally:
         db.close()
+    catalog.rebuild()
+
+
+@app.on_event("startup")
+async def start_jobs():
+    """!
+    @brief Uruchamia kolejkę asynchronicznych zadań wizualizacji.
+    """
+    await job_manager.start()
+
+
+@app.on_event("startup")
+async def start_model_warmup():
+    """!
+    @brief Rozpoczyna w tle rozgrzewanie modelu, jeśli ustawiono VISUALIZATION_WARMUP.
+    
+    Do czasu zakończenia rozgrzewania /health/ready zwraca 503.
+    """
+    if visualization.VISUALIZATION_WARMUP:
+        await visualization.start_warmup()
+
+
+@app.on_event("startup")
+async def start_image_pregeneration():
+    """!
+    @brief Generuje w tle warianty zdjęć produktów, jeśli ustawiono PRODUCT_IMAGE_PREGENERATE.
+    """
+    if os.getenv("PRODUCT_IMAGE_PREGENERATE", "0").lower() in ("1", "true", "yes"):
+        asyncio.get_running_loop().run_in_executor(None, product_images.pregenerate)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """!
+    @brief Zatrzymuje kolejkę zadań, pulę wątków generowania wizualizacji i połączenia
+           asynchronicznego silnika bazy przy wyłączaniu aplikacji.
+    """
+    await job_manager.stop()
+    shutdown_executor()
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -117,187 +241,293 @@ def read_root():
     return RedirectResponse(url="http://localhost:8000")      
 
 
+def _register_gauges():
+    """!
+    @brief Rejestruje metryki chwilowe pamięci podręcznych, kolejek i modelu.
+    """
+    registry = metrics.registry
+    registry.gauge(
+        "visualization_cache_entries", "Visualization cache files on disk.",
+        lambda: visualization_cache.stats()["entries"]
+    )
+    registry.gauge(
+        "visualization_cache_bytes", "Visualization cache size on disk.",
+        lambda: visualization_cache.stats()["bytes"]
+    )
+    registry.gauge(
+        "visualization_cache_hit_ratio", "Visualization cache hit ratio since start.",
+        lambda: visualization_cache.stats()["hit_ratio"]
+    )
+    registry.gauge(
+        "visualization_cache_evictions", "Visualization cache evictions since start.",
+        lambda: visualization_cache.stats()["evictions"]
+    )
+    registry.gauge(
+        "prompt_embedding_cache_entries", "Cached prompt embeddings.",
+        lambda: visualization.remote_status("prompt_cache")["entries"]
+    )
+    registry.gauge(
+        "prompt_embedding_cache_hit_ratio", "Prompt embedding cache hit ratio since start.",
+        lambda: visualization.remote_status("prompt_cache")["hit_rate"]
+    )
+    registry.gauge(
+        "visualization_batch_queue_depth", "Render requests waiting for the micro-batcher.",
+        lambda: visualization.remote_status("batching")["queue_depth"]
+    )
+    registry.gauge(
+        "visualization_batch_avg_size", "Average number of prompts per model call.",
+        lambda: visualization.remote_status("batching")["avg_batch_size"]
+    )
+    registry.gauge(
+        "visualization_admission_in_flight", "Admitted renders in progress.",
+        lambda: visualization.admission.in_flight
+    )
+    registry.gauge(
+        "visualization_admission_rejected", "Renders rejected by admission control since start (served as product-photo preview, or 429 for stored image re-renders).",
+        lambda: {(reason,): count for reason, count in visualization.admission.stats()["rejected"].items()},
+        ("reason",)
+    )
+    registry.gauge(
+        "visualization_jobs_queued", "Visualization jobs waiting or running.",
+        lambda: job_manager.stats()["queued"]
+    )
+    registry.gauge(
+        "visualization_model_ready", "1 if the visualization model is ready.",
+        lambda: visualization.readiness()["ready"]
+    )
+    registry.gauge(
+        "product_image_cache_bytes", "Product image bytes held in memory.",
+        lambda: product_images.hot_cache.stats()["bytes"]
+    )
+    registry.gauge(
+        "product_image_cache_entries", "Product images held in memory.",
+        lambda: product_images.hot_cache.stats()["entries"]
+    )
+
+
+_register_gauges()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """!
+    @brief Zwraca metryki aplikacji w formacie tekstowym Prometheusa.
+    
+    Obejmuje liczbę i czas żądań per szablon ścieżki, liczbę i czas zapytań SQL
+    na żądanie, czasy faz generowania wizualizacji oraz stan pamięci
+    podręcznych i kolejek.
+    """
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health/live")
+def liveness():
+    """!
+    @brief Sonda żywotności - proces obsługuje żądania HTTP.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """!
+    @brief Sonda gotowości odzwierciedlająca stan modelu wizualizacji.
+    
+    @return Stan modelu i czasy faz zimnego startu; kod 503, jeśli model nie jest gotowy
+    """
+    state = visualization.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/catalog")
+async def get_catalog(request: Request):
+    """!
+    @brief Zwraca cały katalog (kwiaty, zieleń, papiery, wstążki) w jednej odpowiedzi.
+    
+    @param request Żądanie HTTP (nagłówek If-None-Match)
+    @return Słownik list produktów lub 304, jeśli ETag się zgadza
+    """
+    body, etag = await catalog.body_async("all")
+    return etag_response(request, body, etag)
+
+
 @app.get("/flowers")
-def list_flowers(db: Session = Depends(get_db)):
+async def list_flowers(request: Request):
     """!
     @brief Zwraca listę wszystkich kwiatów.
     
-    @param db Sesja bazodanowa
+    @param request Żądanie HTTP (nagłówek If-None-Match)
     @return Lista kwiatów z ID, nazwą, ceną, obrazem i max ilością
     """
-    flowers = db.query(Product).filter(Product.category == "flower").all()
-    return [
-        {
-            "id": f.id,
-            "name": f.name,
-            "price": f.price,
-            "image": f"/images/{f.image}",
-            "max_quantity": f.max_quantity
-        }
-        for f in flowers
-    ]
+    body, etag = await catalog.body_async("flowers")
+    return etag_response(request, body, etag)
 
 
 @app.get("/foliage")
-def list_foliage(db: Session = Depends(get_db)):
+async def list_foliage(request: Request):
     """!
     @brief Zwraca listę wszystkich rodzajów zieleni.
     
-    @param db Sesja bazodanowa
+    @param request Żądanie HTTP (nagłówek If-None-Match)
     @return Lista zieleni z ID, nazwą, ceną, obrazem i max ilością
     """
-    foliage = db.query(Product).filter(Product.category == "foliage").all()
-    return [
-        {
-            "id": f.id,
-            "name": f.name,
-            "price": f.price,
-            "image": f"/images/{f.image}",
-            "max_quantity": f.max_quantity
-        }
-        for f in foliage
-    ]
+    body, etag = await catalog.body_async("foliage")
+    return etag_response(request, body, etag)
 
 
 @app.get("/papers")
-def list_papers(db: Session = Depends(get_db)):
+async def list_papers(request: Request):
     """!
     @brief Zwraca listę wszystkich papierów ozdobnych.
     
-    @param db Sesja bazodanowa
+    @param request Żądanie HTTP (nagłówek If-None-Match)
     @return Lista papierów z ID, nazwą, ceną, obrazem i max ilością
     """
-    papers = db.query(Product).filter(Product.category == "paper").all()
-    return [
-        {
-            "id": f.id,
-            "name": f.name,
-            "price": f.price,
-            "image": f"/images/{f.image}",
-            "max_quantity": f.max_quantity
-        }
-        for f in papers
-    ]
+    body, etag = await catalog.body_async("papers")
+    return etag_response(request, body, etag)
 
 
 @app.get("/ribbons")
-def list_ribbons(db: Session = Depends(get_db)):
+async def list_ribbons(request: Request):
     """!
     @brief Zwraca listę wszystkich wstążek.
     
-    @param db Sesja bazodanowa
+    @param request Żądanie HTTP (nagłówek If-None-Match)
     @return Lista wstążek z ID, nazwą, ceną, obrazem i max ilością
     """
-    ribbons = db.query(Product).filter(Product.category == "ribbon").all()
-    return [
-        {
-            "id": f.id,
-            "name": f.name,
-            "price": f.price,
-            "image": f"/images/{f.image}",
-            "max_quantity": f.max_quantity
-        }
-        for f in ribbons
-    ]
+    body, etag = await catalog.body_async("ribbons")
+    return etag_response(request, body, etag)
 
 
-@app.get("/flowers/{name}", response_class=FileResponse)
-def get_flower_image(name: str, db: Session = Depends(get_db)):
+@app.get("/images/{filename}", response_class=FileResponse)
+def get_image(
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, description="Szerokość wariantu, zaokrąglana do 128/256/512/1024"),
+    format: Optional[Literal["webp", "jpeg"]] = None
+):
     """!
-    @brief Zwraca plik obrazu kwiatu.
+    @brief Zwraca zdjęcie produktu w oryginale lub jako pomniejszony wariant.
     
-    @param name Nazwa kwiatu
-    @param db Sesja bazodanowa
-    @return Plik obrazu
-    @throws HTTPException 404 jeśli kwiat lub plik nie istnieje
-    """
-    flower = db.query(Product).filter(Product.name == name, Product.category == "flower").first()
-    if not flower:
-        raise HTTPException(status_code=404, detail="Product not found")
-    image_path = os.path.join("images", flower.image)
-    if not os.path.exists(image_path):
+    Bez parametrów zwracany jest oryginał. Z parametrem w (lub format)
+    zwracany jest wariant WebP/JPEG, generowany przy pierwszym żądaniu
+    i przechowywany na dysku. Bez parametru format wybierany jest WebP,
+    jeśli przeglądarka deklaruje go w nagłówku Accept.
+    
+    @param filename Nazwa pliku zdjęcia
+    @param request Żądanie HTTP (nagłówki Accept i warunkowe)
+    @param w Żądana szerokość w pikselach
+    @param format Wymuszony format wariantu
+    @return Plik obrazu lub 304
+    @throws HTTPException 404 jeśli plik nie istnieje
+    """
+    source = product_images.source_path(filename)
+    if source is None:
         raise HTTPException(status_code=404, detail="Image file not found")
-    return FileResponse(image_path)
+    
+    if w is None and format is None:
+        return cached_file_response(request, source)
+    
+    image_format = product_images.negotiate_format(format, request.headers.get("accept"))
+    width = product_images.snap_width(w or product_images.ALLOWED_WIDTHS[-1])
+    path = product_images.variant_path(source, width, image_format)
+    return cached_file_response(
+        request,
+        path,
+        media_type=MEDIA_TYPES[image_format],
+        headers={"Vary": "Accept"} if format is None else None
+    )
 
 
-@app.get("/foliage/{name}", response_class=FileResponse)
-def get_foliage_image(name: str, db: Session = Depends(get_db)):
+class CollectionConvertor(Convertor):
     """!
-    @brief Zwraca plik obrazu zieleni.
-    
-    @param name Nazwa zieleni
-    @param db Sesja bazodanowa
-    @return Plik obrazu
-    @throws HTTPException 404 jeśli zieleni lub plik nie istnieje
-    """
-    foliage = db.query(Product).filter(Product.name == name, Product.category == "foliage").first()
-    if not foliage:
-        raise HTTPException(status_code=404, detail="Foliage not found")
-    image_path = os.path.join("images", foliage.image)
-    if not os.path.exists(image_path):
-        raise HTTPException(status_code=404, detail="Image file not found")
-    return FileResponse(image_path)
+    @brief Konwerter ścieżki dopasowujący wyłącznie klucze kategorii katalogu.
+
+    Dzięki temu trasa /{collection}/{name} nie przesłania innych tras o dwóch segmentach.
+    """
+
+    regex = "|".join(CATEGORIES.values())
+
+    def convert(self, value: str) -> str:
+        return value
+
+    def to_string(self, value: str) -> str:
+        return value
+
+
+register_url_convertor("collection", CollectionConvertor())
+
+## Komunikaty 404 dla nieznanych produktów, jak w dawnych osobnych trasach kategorii
+PRODUCT_NOT_FOUND = {
+    "flowers": "Product not found",
+    "foliage": "Foliage not found",
+    "papers": "Paper not found",
+    "ribbons": "Ribbon not found",
+}
 
 
-@app.get("/papers/{name}", response_class=FileResponse)
-def get_paper_image(name: str, db: Session = Depends(get_db)):
+@app.get("/{collection:collection}/{name}", response_class=FileResponse)
+def get_product_image(collection: str, name: str, request: Request):
     """!
-    @brief Zwraca plik obrazu papieru.
-    
-    @param name Nazwa papieru
-    @param db Sesja bazodanowa
-    @return Plik obrazu
-    @throws HTTPException 404 jeśli papier lub plik nie istnieje
-    """
-    paper = db.query(Product).filter(Product.name == name, Product.category == "paper").first()
-    if not paper:
-        raise HTTPException(status_code=404, detail="Paper not found")
-    image_path = os.path.join("images", paper.image)
-    if not os.path.exists(image_path):
+    @brief Zwraca plik obrazu produktu na podstawie kategorii i nazwy.
+
+    Nazwa jest wyszukiwana w indeksie migawki katalogu, a zawartość
+    najczęściej pobieranych plików w pamięci podręcznej procesu.
+    Obsługuje ETag, Last-Modified i żądania Range.
+
+    @param collection flowers, foliage, papers lub ribbons
+    @param name Nazwa produktu
+    @param request Żądanie HTTP
+    @return Plik obrazu (200/206) lub 304
+    @throws HTTPException 404 jeśli produkt lub plik nie istnieje
+    """
+    exists, image = catalog.image(collection, name)
+    if not exists:
+        raise HTTPException(status_code=404, detail=PRODUCT_NOT_FOUND[collection])
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image file not found")
+    if not_modified(request, image.etag, image.mtime):
+        return bytes_response(request, b"", image.etag, image.mtime, image.media_type)
+    try:
+        data = product_images.hot_cache.read(image)
+    except FileNotFoundError:
+        catalog.invalidate()
         raise HTTPException(status_code=404, detail="Image file not found")
-    return FileResponse(image_path)
+    return bytes_response(request, data, image.etag, image.mtime, image.media_type)
 
 
-@app.get("/ribbons/{name}", response_class=FileResponse)
-def get_ribbon_image(name: str, db: Session = Depends(get_db)):
+def fetch_products(db: Session, *item_lists) -> Dict[int, Product]:
     """!
-    @brief Zwraca plik obrazu wstążki.
+    @brief Pobiera jednym zapytaniem wszystkie produkty wskazane w listach pozycji.
+    
+    Podobnie jak pozostałe funkcje pomocnicze przyjmuje sesję synchroniczną;
+    endpointy async wywołują je przez AsyncSession.run_sync.
     
-    @param name Nazwa wstążki
     @param db Sesja bazodanowa
-    @return Plik obrazu
-    @throws HTTPException 404 jeśli wstążka lub plik nie istnieje
-    """
-    ribbon = db.query(Product).filter(Product.name == name, Product.category == "ribbon").first()
-    if not ribbon:
-        raise HTTPException(status_code=404, detail="Ribbon not found")
-    image_path = os.path.join("images", ribbon.image)
-    if not os.path.exists(image_path):
-        raise HTTPException(status_code=404, detail="Image file not found")
-    return FileResponse(image_path)
+    @param item_lists Listy pozycji żądania (kwiaty, papiery, wstążki)
+    @return Słownik ID produktu -> Product (brakujące ID są pomijane)
+    """
+    ids = {item.id for items in item_lists for item in items}
+    if not ids:
+        return {}
+    return {product.id: product for product in db.query(Product).filter(Product.id.in_(ids)).all()}
 
 
-@app.post("/api/visualization", response_model=VisualizationResponse)
-async def generate_visualization(
-    request: VisualizationRequest,
-    db: Session = Depends(get_db)
-):
+def build_order_data(request: VisualizationRequest, db: Session) -> dict:
     """!
-    @brief Generuje wizualizację bukietu AI bez zapisywania zamówienia.
-    
-    Endpoint waliduje dostępność produktów i ich ilości, następnie wywołuje
-    model AI do wygenerowania obrazu bukietu.
+    @brief Waliduje skład bukietu i buduje dane wejściowe dla generatora wizualizacji.
     
     @param request Dane wizualizacji (kwiaty, papiery, wstążki)
     @param db Sesja bazodanowa
-    @return URL do wygenerowanego obrazu w formacie base64
+    @return Słownik z listami flowers, papers, ribbons
     @throws HTTPException 400 jeśli produkty nie istnieją lub przekroczono max ilość
     """
     order_data = {'flowers': [], 'papers': [], 'ribbons': []}
     missing = []
+    products = fetch_products(db, request.flowers, request.papers, request.ribbons)
 
     for flower_item in request.flowers:
-        product = db.query(Product).filter(Product.id == flower_item.id).first()
+        product = products.get(flower_item.id)
         if not product:
             missing.append(f"flower:{flower_item.id}")
             continue
@@ -319,11 +549,8 @@ async def generate_visualization(
         })
     
     for paper_item in request.papers:
-        product = db.query(Product).filter(
-            Product.id == paper_item.id,
-            Product.category == "paper"
-        ).first()
-        if not product:
+        product = products.get(paper_item.id)
+        if not product or product.category != "paper":
             missing.append(f"paper:{paper_item.id}")
             continue
         if product.max_quantity > 0 and product.max_quantity < 1:
@@ -338,11 +565,8 @@ async def generate_visualization(
         })
     
     for ribbon_item in request.ribbons:
-        product = db.query(Product).filter(
-            Product.id == ribbon_item.id,
-            Product.category == "ribbon"
-        ).first()
-        if not product:
+        product = products.get(ribbon_item.id)
+        if not product or product.category != "ribbon":
             missing.append(f"ribbon:{ribbon_item.id}")
             continue
         if product.max_quantity > 0 and product.max_quantity < 1:
@@ -359,40 +583,472 @@ async def generate_visualization(
     if missing:
         raise HTTPException(status_code=400, detail=f"Products error: {', '.join(missing)}")
 
-    image_url = await generate_bouquet_visualization(order_data)
+    return order_data
 
-    return VisualizationResponse(imageUrl=image_url)
 
+def visualization_image_url(visualization_id: int) -> str:
+    """!
+    @brief Zwraca trwały URL obrazu wizualizacji, odtwarzanego po usunięciu pliku z pamięci podręcznej.
+    """
+    return f"/api/visualizations/{visualization_id}/image"
 
-@app.post("/orders", response_model=CreateOrderResponse)
-def create_order(
-    request: CreateOrderRequest,
-    db: Session = Depends(get_db)
+
+def visualization_spec(record: Visualization) -> dict:
+    """!
+    @brief Odtwarza specyfikację generowania (jak describe_visualization) z zapisanej wizualizacji.
+    """
+    return {
+        "key": record.composition_key,
+        "seed": record.seed,
+        "prompt": record.prompt,
+        "params": json.loads(record.params),
+    }
+
+
+async def save_visualization(db: AsyncSession, spec: dict, image_name: str) -> Visualization:
+    """!
+    @brief Zapisuje wizualizację albo zwraca istniejącą o tym samym kluczu kompozycji.
+    
+    @param db Sesja bazodanowa
+    @param spec Wynik describe_visualization
+    @param image_name Nazwa pliku w katalogu wizualizacji
+    @return Zapisana wizualizacja
+    """
+    query = select(Visualization).where(Visualization.composition_key == spec["key"])
+    record = (await db.execute(query)).scalar_one_or_none()
+    if record is not None:
+        return record
+    record = Visualization(
+        composition_key=spec["key"],
+        prompt=spec["prompt"],
+        seed=spec["seed"],
+        params=json.dumps(spec["params"], sort_keys=True),
+        image_name=image_name
+    )
+    db.add(record)
+    try:
+        await db.commit()
+    except SQLAlchemyIntegrityError:
+        # Równoległe żądanie z tym samym składem zapisało wizualizację wcześniej
+        await db.rollback()
+        record = (await db.execute(query)).scalar_one()
+    return record
+
+
+def client_key(request: HTTPConnection, pseudonim: Optional[str] = None) -> str:
+    """!
+    @brief Zwraca klucz klienta dla limitu równoległych renderowań: pseudonim lub adres IP.
+    """
+    if pseudonim:
+        return f"pseudonim:{pseudonim}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def overloaded(rejection: AdmissionRejected) -> HTTPException:
+    """!
+    @brief Zamienia odrzucenie przez kontrolę dopuszczania w odpowiedź 429 z nagłówkiem Retry-After.
+    """
+    detail = "Visualization queue is full" if rejection.reason == "queue_full" else "Too many visualizations in progress"
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(rejection.retry_after)})
+
+
+@app.post("/api/visualization", response_model=VisualizationResponse)
+async def generate_visualization(
+    request: VisualizationRequest,
+    http_request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """!
-    @brief Tworzy nowe zamówienie w bazie danych.
+    @brief Generuje wizualizację bukietu AI bez zapisywania zamówienia.
     
-    Endpoint zapisuje zamówienie wraz z danymi klienta (pseudonim, data odbioru,
-    sposób odbioru, płatność) oraz listą produktów.
+    Endpoint waliduje dostępność produktów i ich ilości, następnie wywołuje
+    model AI do wygenerowania obrazu bukietu. Wizualizacja jest zapisywana
+    w bazie (jedna na skład i parametry), a jej ID można przekazać przy
+    składaniu zamówienia. Nagłówki X-Image-Cache,
+    X-Prompt-Cache i Server-Timing (encode, render) opisują koszt żądania.
     
-    @param request Dane zamówienia z formularza i wybrane produkty
+    Renderowanie (chybienie pamięci podręcznej) podlega kontroli dopuszczania:
+    przy pełnej kolejce lub zbyt wielu renderowaniach klienta (pseudonim lub
+    adres IP) od razu zwracany jest podgląd złożony ze zdjęć produktów
+    (preview=true) z nagłówkiem Retry-After. Podgląd jest zwracany także,
+    gdy model jest niedostępny.
+    
+    @param request Dane wizualizacji (kwiaty, papiery, wstążki, format i jakość obrazu)
+    @param http_request Żądanie HTTP (adres klienta)
+    @param response Odpowiedź HTTP (nagłówki raportu)
     @param db Sesja bazodanowa
-    @return ID utworzonego zamówienia i komunikat potwierdzający
-    @throws HTTPException 404 jeśli produkt nie istnieje
-    @throws HTTPException 400 jeśli przekroczono maksymalną ilość produktu
+    @return Krótki URL do pliku wygenerowanego obrazu i ID wizualizacji
+    @throws HTTPException 400 jeśli produkty nie istnieją lub przekroczono max ilość
     """
-    new_order = Order(
-        pseudonim=request.pseudonim,
-        data=request.data,
-        godzina=request.godzina,
-        odbior=request.odbior,
-        platnosc=request.platnosc
+    order_data = await db.run_sync(lambda session: build_order_data(request, session))
+    report = {}
+    try:
+        image_url = await generate_bouquet_visualization(
+            order_data, request.format, request.quality, report, client_key(http_request, request.pseudonim)
+        )
+    except AdmissionRejected as e:
+        response.headers["Retry-After"] = str(e.retry_after)
+        image_url = await visualization.preview_visualization(order_data, request.format, request.quality, report)
+    record = await save_visualization(db, report["spec"], report["image_name"]) if "image_name" in report else None
+    
+    response.headers["X-Image-Cache"] = report["image_cache"]
+    if "prompt_cache" in report:
+        response.headers["X-Prompt-Cache"] = report["prompt_cache"]
+        response.headers["Server-Timing"] = (
+            f"encode;dur={report.get('encode_ms', 0.0)}, render;dur={report['render_ms']}"
+        )
+
+    return VisualizationResponse(
+        imageUrl=image_url,
+        id=record.id if record else None,
+        preview=report.get("preview", False)
     )
-    db.add(new_order)
-    db.flush()
+
+
+@app.post("/api/visualization/preview", response_model=VisualizationResponse)
+async def preview_visualization(request: VisualizationRequest, db: AsyncSession = Depends(get_async_db)):
+    """!
+    @brief Zwraca w kilka milisekund podgląd bukietu złożony ze zdjęć produktów, bez udziału modelu.
+    
+    Klient może pokazać podgląd od razu, a obraz modelu pobrać przez
+    POST /api/visualization lub zadanie /api/visualization/jobs.
+    
+    @param request Dane wizualizacji (kwiaty, papiery, wstążki, format i jakość obrazu)
+    @param db Sesja bazodanowa
+    @return URL podglądu (preview=true)
+    @throws HTTPException 400 jeśli produkty nie istnieją lub przekroczono max ilość
+    """
+    order_data = await db.run_sync(lambda session: build_order_data(request, session))
+    await db.close()
+    image_url = await visualization.preview_visualization(order_data, request.format, request.quality)
+    return VisualizationResponse(imageUrl=image_url, preview=True)
+
+
+async def stream_visualization(send: Callable[[dict], None], request: VisualizationRequest, seq: int, client: str):
+    """!
+    @brief Przekazuje do wysłania kolejne etapy wizualizacji jednej wersji składu.
+    
+    Najpierw podgląd ze zdjęć produktów (pomijany, gdy obraz modelu jest już
+    w pamięci podręcznej), potem obraz modelu. Anulowanie zadania przed
+    startem partii usuwa renderowanie z kolejki modelu.
+    
+    @param send Funkcja kolejkująca komunikat do wysłania przez WebSocket
+    @param request Skład bukietu
+    @param seq Numer wersji składu w połączeniu
+    @param client Klucz klienta dla kontroli dopuszczania
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            order_data = await db.run_sync(lambda session: build_order_data(request, session))
+        except HTTPException as e:
+            send({"type": "error", "seq": seq, "status": e.status_code, "detail": e.detail})
+            return
+        await db.close()
+        
+        spec = visualization.describe_visualization(order_data, request.format, request.quality)
+        if not visualization_cache.contains(spec["key"]):
+            preview_url = await visualization.preview_visualization(order_data, request.format, request.quality)
+            send({"type": "preview", "seq": seq, "imageUrl": preview_url})
+        
+        report = {}
+        try:
+            image_url = await generate_bouquet_visualization(
+                order_data, request.format, request.quality, report, client
+            )
+        except AdmissionRejected as e:
+            send({"type": "overloaded", "seq": seq, "retryAfter": e.retry_after})
+            return
+        record = await save_visualization(db, report["spec"], report["image_name"]) if "image_name" in report else None
+        send({
+            "type": "final",
+            "seq": seq,
+            "imageUrl": image_url,
+            "id": record.id if record else None,
+            "preview": report.get("preview", False),
+        })
+
+
+def _stream_finished(task: asyncio.Task):
+    """!
+    @brief Odbiera wynik zakończonego zadania połączenia WebSocket, aby jego błąd nie przepadł.
+    """
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None and not isinstance(error, WebSocketDisconnect):
+        logging.getLogger(__name__).error("WebSocket visualization stream failed: %s", error, exc_info=error)
+
+
+@app.websocket("/ws/visualization")
+async def visualization_socket(websocket: WebSocket):
+    """!
+    @brief Progresywne dostarczanie wizualizacji dla kolejnych zmian składu bukietu.
+    
+    Klient wysyła kolejne wersje składu (JSON jak w POST /api/visualization),
+    a serwer odpowiada komunikatami z numerem wersji seq:
+    - preview - natychmiastowy podgląd ze zdjęć produktów,
+    - final - obraz modelu (id wizualizacji; preview=true, jeśli model zawiódł),
+    - overloaded - model przeciążony (retryAfter w sekundach), podgląd pozostaje aktualny,
+    - error - nieprawidłowy skład (status, detail).
+    Nowa wersja składu anuluje renderowanie poprzedniej, więc model nie
+    generuje bukietów, które klient zdążył już zmienić. Wszystkie komunikaty
+    wysyła jedno zadanie z kolejki, w kolejności ich powstania, z pominięciem
+    komunikatów wersji zastąpionych nowszą.
+    
+    @param websocket Połączenie WebSocket
+    """
+    await websocket.accept()
+    client = client_key(websocket, websocket.query_params.get("pseudonim"))
+    outbox = asyncio.Queue()
+    seq = 0
+    # Ostatnia wersja składu, dla której powstał komunikat końcowy (final, overloaded, error)
+    answered = 0
+    
+    def send(message: dict):
+        nonlocal answered
+        if message["type"] != "preview":
+            answered = message["seq"]
+        outbox.put_nowait(message)
+    
+    async def sender():
+        while True:
+            message = await outbox.get()
+            if message["seq"] == seq:
+                await websocket.send_json(message)
+    
+    sender_task = asyncio.create_task(sender())
+    sender_task.add_done_callback(_stream_finished)
+    task = None
+    task_seq = 0
+    try:
+        while True:
+            message = await websocket.receive_text()
+            seq += 1
+            # Zadanie po komunikacie końcowym może jeszcze zamykać sesję - nie jest wtedy liczone
+            if task is not None and task.cancel() and answered < task_seq:
+                metrics.websocket_superseded.inc()
+            try:
+                request = VisualizationRequest.model_validate_json(message)
+            except ValidationError as e:
+                send({"type": "error", "seq": seq, "status": 422, "detail": json.loads(e.json())})
+                continue
+            task = asyncio.create_task(stream_visualization(send, request, seq, client))
+            task_seq = seq
+            task.add_done_callback(_stream_finished)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender_task.cancel()
+        if task is not None:
+            task.cancel()
+
+
+@app.get("/api/visualization/cache")
+def visualization_cache_stats():
+    """!
+    @brief Zwraca statystyki pamięci podręcznej wizualizacji.
+    
+    @return Liczniki trafień i chybień oraz zajętość dysku
+    """
+    return visualization_cache.stats()
+
+
+@app.get("/api/visualization/batching")
+def visualization_batching_stats():
+    """!
+    @brief Zwraca statystyki planisty mikro-partii inferencji.
+    
+    @return Histogram rozmiarów partii oraz czasy oczekiwania w kolejce
+    @note Przy VISUALIZATION_BACKEND=remote są to statystyki serwera inferencji
+    """
+    return visualization.remote_status("batching")
+
+
+@app.get("/api/visualization/admission")
+def visualization_admission_stats():
+    """!
+    @brief Zwraca stan kontroli dopuszczania renderowań.
+    
+    @return Liczba renderowań w toku, limity, liczniki odrzuceń i szacowany czas renderowania
+    """
+    return visualization.admission.stats()
+
+
+@app.get("/api/visualizations/{visualization_id}", response_model=VisualizationDetailResponse)
+async def get_visualization(visualization_id: int, db: AsyncSession = Depends(get_async_db)):
+    """!
+    @brief Zwraca zapisaną wizualizację wraz z promptem, ziarnem i parametrami.
+    
+    @param visualization_id ID wizualizacji
+    @param db Sesja bazodanowa
+    @return Dane wizualizacji z trwałym URL obrazu
+    @throws HTTPException 404 jeśli wizualizacja nie istnieje
+    """
+    record = await db.get(Visualization, visualization_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Visualization not found")
+    return VisualizationDetailResponse(
+        id=record.id,
+        imageUrl=visualization_image_url(record.id),
+        prompt=record.prompt,
+        seed=record.seed,
+        params=json.loads(record.params),
+        created_at=record.created_at
+    )
+
+
+@app.get("/api/visualizations/{visualization_id}/image", response_class=FileResponse)
+async def get_visualization_image(
+    visualization_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Zwraca obraz zapisanej wizualizacji.
+    
+    Jeśli plik został usunięty z pamięci podręcznej, obraz jest generowany
+    ponownie z zapisanego promptu, ziarna i parametrów - wynik jest taki sam
+    jak pierwotnie zaakceptowany przez klienta.
+    
+    @param visualization_id ID wizualizacji
+    @param request Żądanie HTTP (nagłówki warunkowe)
+    @param db Sesja bazodanowa
+    @return Plik obrazu lub 304
+    @throws HTTPException 404 jeśli wizualizacja nie istnieje
+    @throws HTTPException 429 z nagłówkiem Retry-After, jeśli model jest przeciążony
+    @throws HTTPException 503 jeśli ponowne generowanie się nie powiodło
+    """
+    record = await db.get(Visualization, visualization_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Visualization not found")
+    spec = visualization_spec(record)
+    await db.close()
+    
+    try:
+        name = await visualization.render_visualization(spec, client=client_key(request))
+    except AdmissionRejected as e:
+        raise overloaded(e)
+    except Exception as e:
+        logging.getLogger(__name__).error("Re-rendering visualization %s failed: %s", visualization_id, e)
+        raise HTTPException(status_code=503, detail="Visualization is temporarily unavailable")
+    return cached_file_response(request, visualization.IMAGES_DIR / name)
+
+
+@app.get("/api/visualization/prompt-cache")
+def visualization_prompt_cache_stats():
+    """!
+    @brief Zwraca statystyki pamięci podręcznej osadzeń promptów.
+    
+    @return Liczba wpisów, trafienia, chybienia, współczynnik trafień i średni czas kodera
+    @note Przy VISUALIZATION_BACKEND=remote są to statystyki serwera inferencji
+    """
+    return visualization.remote_status("prompt_cache")
+
+
+@app.post("/api/visualization/jobs", response_model=VisualizationJobResponse, status_code=202)
+async def submit_visualization_job(
+    request: VisualizationRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Zgłasza asynchroniczne zadanie generowania wizualizacji.
+    
+    Endpoint waliduje skład bukietu i od razu zwraca identyfikator zadania
+    wraz z podglądem złożonym ze zdjęć produktów (previewUrl). Wynik można odczytać przez GET /api/visualization/{job_id} lub strumień
+    SSE GET /api/visualization/{job_id}/events.
+    
+    @param request Dane wizualizacji (kwiaty, papiery, wstążki)
+    @param db Sesja bazodanowa
+    @return Identyfikator i stan zadania
+    @throws HTTPException 400 jeśli produkty nie istnieją lub przekroczono max ilość
+    @throws HTTPException 503 jeśli kolejka zadań jest pełna
+    """
+    params = {
+        "order_data": await db.run_sync(lambda session: build_order_data(request, session)),
+        "image_format": request.format,
+        "quality": request.quality,
+    }
+    try:
+        state = await job_manager.submit(params)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Visualization queue is full")
+    return {
+        **state,
+        "previewUrl": await visualization.preview_visualization(
+            params["order_data"], request.format, request.quality
+        ),
+    }
+
+
+@app.get("/api/visualization/jobs")
+def visualization_jobs_stats():
+    """!
+    @brief Zwraca statystyki kolejki zadań wizualizacji.
+    
+    @return Liczba oczekujących zadań, pojemność kolejki i liczba subskrypcji
+    """
+    return job_manager.stats()
+
+
+@app.get("/api/visualization/{job_id}", response_model=VisualizationJobResponse)
+def get_visualization_job(job_id: str):
+    """!
+    @brief Zwraca stan i wynik zadania wizualizacji.
+    
+    @param job_id Identyfikator zadania
+    @return Stan zadania, a po zakończeniu URL obrazu
+    @throws HTTPException 404 jeśli zadanie nie istnieje lub wygasło
+    """
+    state = job_manager.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return state
+
+
+@app.get("/api/visualization/{job_id}/events")
+async def stream_visualization_job(job_id: str):
+    """!
+    @brief Strumień SSE ze zmianami stanu zadania wizualizacji.
+    
+    Każda zmiana (pozycja w kolejce, rozpoczęcie, zakończenie) jest wysyłana
+    jako zdarzenie "status"; strumień kończy się po stanie completed/failed.
+    
+    @param job_id Identyfikator zadania
+    @return Odpowiedź text/event-stream
+    @throws HTTPException 404 jeśli zadanie nie istnieje lub wygasło
+    """
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for state in job_manager.events(job_id):
+            if state is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def build_order_items(request: CreateOrderRequest, products: Dict[int, Product]) -> List[dict]:
+    """!
+    @brief Waliduje pozycje zamówienia i buduje wiersze tabeli order_items.
+    
+    @param request Dane zamówienia
+    @param products Produkty pobrane przez fetch_products
+    @return Lista słowników z kolumnami OrderItem (bez order_id)
+    @throws HTTPException 404 jeśli produkt nie istnieje
+    @throws HTTPException 400 jeśli produkt ma złą kategorię lub przekroczono max ilość
+    """
+    rows = []
     
     for flower_item in request.flowers:
-        product = db.query(Product).filter(Product.id == flower_item.id).first()
+        product = products.get(flower_item.id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {flower_item.id} not found")
         
@@ -402,95 +1058,429 @@ def create_order(
         if product.max_quantity > 0 and flower_item.quantity > product.max_quantity:
             raise HTTPException(status_code=400, detail=f"Quantity exceeds max for {product.name}")
         
-        db.add(OrderItem(
-            order_id=new_order.id,
-            product_id=product.id,
-            category=product.category,
-            quantity=flower_item.quantity,
-            viz_id=request.visualization_id
-        ))
+        rows.append({
+            "product_id": product.id,
+            "category": product.category,
+            "quantity": flower_item.quantity,
+            "unit_price": product.price,
+            "viz_id": request.visualization_id
+        })
     
     for paper_item in request.papers:
-        product = db.query(Product).filter(
-            Product.id == paper_item.id,
-            Product.category == "paper"
-        ).first()
-        if not product:
+        product = products.get(paper_item.id)
+        if not product or product.category != "paper":
             raise HTTPException(status_code=404, detail=f"Paper {paper_item.id} not found")
         
-        db.add(OrderItem(
-            order_id=new_order.id,
-            product_id=product.id,
-            category=product.category,
-            quantity=1,
-            viz_id=request.visualization_id
-        ))
+        rows.append({
+            "product_id": product.id,
+            "category": product.category,
+            "quantity": 1,
+            "unit_price": product.price,
+            "viz_id": request.visualization_id
+        })
     
     for ribbon_item in request.ribbons:
-        product = db.query(Product).filter(
-            Product.id == ribbon_item.id,
-            Product.category == "ribbon"
-        ).first()
-        if not product:
+        product = products.get(ribbon_item.id)
+        if not product or product.category != "ribbon":
             raise HTTPException(status_code=404, detail=f"Ribbon {ribbon_item.id} not found")
         
-        db.add(OrderItem(
-            order_id=new_order.id,
-            product_id=product.id,
-            category=product.category,
-            quantity=1,
-            viz_id=request.visualization_id
-        ))
+        rows.append({
+            "product_id": product.id,
+            "category": product.category,
+            "quantity": 1,
+            "unit_price": product.price,
+            "viz_id": request.visualization_id
+        })
+    
+    return rows
+
+
+def existing_visualizations(db: Session, *requests: CreateOrderRequest) -> set:
+    """!
+    @brief Sprawdza jednym zapytaniem, które z wizualizacji wskazanych w zamówieniach istnieją.
+    
+    @param db Sesja bazodanowa
+    @param requests Zamówienia
+    @return Zbiór istniejących ID wizualizacji
+    """
+    ids = {request.visualization_id for request in requests if request.visualization_id is not None}
+    if not ids:
+        return set()
+    return set(db.scalars(select(Visualization.id).where(Visualization.id.in_(ids))))
+
+
+def order_image_url(request: CreateOrderRequest, visualizations: set) -> Optional[str]:
+    """!
+    @brief Wyznacza URL wizualizacji zapisywany w zamówieniu.
     
-    db.commit()
+    Dla zamówienia powiązanego z wizualizacją domyślnie jest to trwały URL
+    /api/visualizations/{id}/image, więc strona zamówienia nie wymaga
+    ponownego generowania obrazu.
+    
+    @param request Dane zamówienia
+    @param visualizations Wynik existing_visualizations
+    @return URL obrazu lub None
+    @throws HTTPException 404 jeśli wizualizacja nie istnieje
+    """
+    if request.visualization_id is None:
+        return request.image_url
+    if request.visualization_id not in visualizations:
+        raise HTTPException(status_code=404, detail=f"Visualization {request.visualization_id} not found")
+    return request.image_url or visualization_image_url(request.visualization_id)
+
+
+@app.post("/orders", response_model=CreateOrderResponse)
+async def create_order(
+    request: CreateOrderRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Tworzy nowe zamówienie w bazie danych.
+    
+    Endpoint zapisuje zamówienie wraz z danymi klienta (pseudonim, data odbioru,
+    sposób odbioru, płatność) oraz listą produktów. Produkty są pobierane
+    jednym zapytaniem, a pozycje wstawiane jednym poleceniem executemany.
+    Ceny pozycji i cena całkowita są zapisywane razem z zamówieniem, a dzienne
+    podsumowania sprzedaży aktualizowane w tej samej transakcji.
+    
+    @param request Dane zamówienia z formularza i wybrane produkty
+    @param db Sesja bazodanowa
+    @return ID utworzonego zamówienia i komunikat potwierdzający
+    @throws HTTPException 404 jeśli produkt lub wizualizacja nie istnieje
+    @throws HTTPException 400 jeśli przekroczono maksymalną ilość produktu
+    """
+    products = await db.run_sync(fetch_products, request.flowers, request.papers, request.ribbons)
+    item_rows = build_order_items(request, products)
+    image_url = order_image_url(request, await db.run_sync(existing_visualizations, request))
+    total_price = sum(row["unit_price"] * row["quantity"] for row in item_rows)
+    created_at = datetime.now()
+    
+    new_order = Order(
+        pseudonim=request.pseudonim,
+        data=request.data,
+        godzina=request.godzina,
+        odbior=request.odbior,
+        platnosc=request.platnosc,
+        image_url=image_url,
+        visualization_id=request.visualization_id,
+        total_price=total_price,
+        created_at=created_at
+    )
+    db.add(new_order)
+    await db.flush()
+    
+    order_id = new_order.id
+    
+    if item_rows:
+        for row in item_rows:
+            row["order_id"] = order_id
+        await db.execute(insert(OrderItem), item_rows)
+    
+    await db.run_sync(sales.record_sales, [(created_at.date(), total_price, item_rows)])
+    await db.commit()
     
     return CreateOrderResponse(
-        order_id=new_order.id,
+        order_id=order_id,
         message="Order created successfully"
     )
 
 
+## Maksymalna liczba zamówień w jednym żądaniu POST /orders/bulk (zmienna MAX_BULK_ORDERS)
+MAX_BULK_ORDERS = int(os.getenv("MAX_BULK_ORDERS", "1000"))
+
+
+@app.post("/orders/bulk", response_model=BulkOrderResponse)
+async def create_orders_bulk(
+    request: BulkOrderRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Zapisuje wiele zamówień w jednej transakcji.
+    
+    Wszystkie zamówienia są walidowane względem produktów pobranych jednym
+    zapytaniem, a poprawne wstawiane w jednej transakcji (zamówienia z
+    RETURNING id w kolejności żądania, potem pozycje jednym poleceniem
+    executemany). Błędne zamówienia nie przerywają importu -
+    są zwracane z kodem i opisem błędu, jaki dałby POST /orders.
+    
+    @param request Lista zamówień
+    @param db Sesja bazodanowa
+    @return ID utworzonych zamówień lub błędy, w kolejności żądania
+    @throws HTTPException 400 jeśli przekroczono MAX_BULK_ORDERS
+    """
+    if len(request.orders) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDERS} orders per request")
+    
+    products = await db.run_sync(
+        fetch_products,
+        *[items for order in request.orders for items in (order.flowers, order.papers, order.ribbons)]
+    )
+    visualizations = await db.run_sync(existing_visualizations, *request.orders)
+    
+    created_at = datetime.now()
+    results = []
+    accepted = []
+    for index, order in enumerate(request.orders):
+        try:
+            rows = build_order_items(order, products)
+            accepted.append((index, order, rows, order_image_url(order, visualizations)))
+        except HTTPException as error:
+            results.append(BulkOrderResult(index=index, status_code=error.status_code, error=error.detail))
+    
+    if accepted:
+        # Kolejność wierszy RETURNING nie jest gwarantowana, więc ID są wiązane
+        # z zamówieniami przez sort_by_parameter_order
+        order_ids = (await db.execute(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [
+                {
+                    "pseudonim": order.pseudonim,
+                    "data": order.data,
+                    "godzina": order.godzina,
+                    "odbior": order.odbior,
+                    "platnosc": order.platnosc,
+                    "image_url": image_url,
+                    "visualization_id": order.visualization_id,
+                    "total_price": sum(row["unit_price"] * row["quantity"] for row in rows),
+                    "created_at": created_at,
+                }
+                for _, order, rows, image_url in accepted
+            ]
+        )).scalars().all()
+        
+        item_rows = []
+        for (index, _, rows, _), order_id in zip(accepted, order_ids):
+            for row in rows:
+                row["order_id"] = order_id
+            item_rows.extend(rows)
+            results.append(BulkOrderResult(index=index, order_id=order_id))
+        if item_rows:
+            await db.execute(insert(OrderItem), item_rows)
+        await db.run_sync(sales.record_sales, [
+            (created_at.date(), sum(row["unit_price"] * row["quantity"] for row in rows), rows)
+            for _, _, rows, _ in accepted
+        ])
+        await db.commit()
+    
+    results.sort(key=lambda result: result.index)
+    return BulkOrderResponse(created=len(accepted), failed=len(results) - len(accepted), results=results)
+
+
+def load_order_details(db: Session, order_ids: List[int]) -> List[OrderDetailResponse]:
+    """!
+    @brief Pobiera szczegóły wielu zamówień stałą liczbą zapytań.
+    
+    Zamówienia są ładowane razem z pozycjami i produktami (selectinload +
+    joinedload). Ceny pochodzą z chwili złożenia zamówienia.
+    
+    @param db Sesja bazodanowa
+    @param order_ids Lista ID zamówień
+    @return Szczegóły znalezionych zamówień w kolejności order_ids
+    """
+    if not order_ids:
+        return []
+    
+    orders = (
+        db.query(Order)
+        .options(selectinload(Order.items).joinedload(OrderItem.product))
+        .filter(Order.id.in_(order_ids))
+        .all()
+    )
+    by_id = {order.id: order for order in orders}
+    
+    details = []
+    for order_id in dict.fromkeys(order_ids):
+        order = by_id.get(order_id)
+        if order is None:
+            continue
+        items = [
+            OrderItemResponse(
+                product_id=order_item.product.id,
+                product_name=order_item.product.name,
+                category=order_item.category,
+                quantity=order_item.quantity,
+                price=order_item.unit_price
+            )
+            for order_item in order.items
+        ]
+        details.append(OrderDetailResponse(
+            order_id=order.id,
+            pseudonim=order.pseudonim,
+            data=order.data,
+            godzina=order.godzina,
+            odbior=order.odbior,
+            platnosc=order.platnosc,
+            items=items,
+            total_price=order.total_price or 0,
+            image_url=order.image_url,
+            visualization_id=order.visualization_id
+        ))
+    return details
+
+
+## Maksymalna liczba zamówień pobieranych jednym żądaniem GET /orders?ids=...
+MAX_BATCH_ORDER_IDS = 200
+
+## Maksymalny rozmiar strony listy zamówień
+MAX_ORDER_PAGE_SIZE = 500
+
+
+@app.get("/orders", response_model=OrderListResponse)
+async def get_orders(
+    ids: Optional[str] = Query(None, description="Lista ID zamówień oddzielonych przecinkami"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    odbior: Optional[str] = None,
+    platnosc: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Zwraca listę zamówień stronicowaną kluczem albo wybrane zamówienia po ID.
+    
+    Bez parametru ids zwraca stronę zamówień uporządkowanych po (data, godzina, id),
+    z opcjonalnymi filtrami. Kolejną stronę pobiera się, przekazując next_cursor.
+    
+    @param ids ID zamówień oddzielone przecinkami, np. 1,2,3 (pomija stronicowanie)
+    @param date_from Najwcześniejsza data odbioru (włącznie)
+    @param date_to Najpóźniejsza data odbioru (włącznie)
+    @param odbior Sposób odbioru
+    @param platnosc Forma płatności
+    @param cursor Kursor z poprzedniej strony
+    @param limit Rozmiar strony
+    @param db Sesja bazodanowa
+    @return Szczegóły zamówień i kursor następnej strony
+    @throws HTTPException 400 jeśli lista ID lub kursor są niepoprawne
+    """
+    if ids is not None:
+        try:
+            order_ids = [int(part) for part in ids.split(",") if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+        if len(order_ids) > MAX_BATCH_ORDER_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ORDER_IDS} ids per request")
+        return OrderListResponse(orders=await db.run_sync(load_order_details, order_ids))
+    
+    conditions = order_filters(date_from, date_to, odbior, platnosc)
+    try:
+        order_ids, next_cursor = await db.run_sync(page_order_keys, conditions, cursor, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return OrderListResponse(orders=await db.run_sync(load_order_details, order_ids), next_cursor=next_cursor)
+
+
+@app.get("/orders/export")
+def export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    odbior: Optional[str] = None,
+    platnosc: Optional[str] = None
+):
+    """!
+    @brief Strumieniowy eksport zamówień (jeden wiersz na pozycję) w NDJSON lub CSV.
+    
+    Wiersze są czytane kursorem i wysyłane na bieżąco, więc pamięć serwera
+    nie zależy od liczby eksportowanych zamówień.
+    
+    @param format ndjson lub csv
+    @param date_from Najwcześniejsza data odbioru (włącznie)
+    @param date_to Najpóźniejsza data odbioru (włącznie)
+    @param odbior Sposób odbioru
+    @param platnosc Forma płatności
+    @return Strumień application/x-ndjson lub text/csv
+    """
+    conditions = order_filters(date_from, date_to, odbior, platnosc)
+    
+    def stream():
+        # Sesja jest otwierana w generatorze, bo zależności FastAPI są
+        # zamykane przed wysłaniem treści odpowiedzi strumieniowej.
+        db = SessionLocal()
+        try:
+            rows = export_rows(db, conditions)
+            yield from chunked(to_csv(rows) if format == "csv" else to_ndjson(rows))
+        finally:
+            db.close()
+    
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'}
+    )
+
+
 @app.get("/orders/{order_id}", response_model=OrderDetailResponse)
-def get_order(order_id: int, db: Session = Depends(get_db)):
+async def get_order(order_id: int, db: AsyncSession = Depends(get_async_db)):
     """!
     @brief Zwraca szczegóły zamówienia po ID.
     
     Endpoint pobiera pełne informacje o zamówieniu: dane klienta, listę produktów,
-    całkowitą cenę oraz URL wizualizacji.
+    całkowitą cenę oraz URL wizualizacji. Liczba zapytań nie zależy od liczby pozycji.
     
     @param order_id ID zamówienia
     @param db Sesja bazodanowa
     @return Szczegóły zamówienia z pozycjami i ceną całkowitą
     @throws HTTPException 404 jeśli zamówienie nie istnieje
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+    details = await db.run_sync(load_order_details, [order_id])
+    if not details:
         raise HTTPException(status_code=404, detail="Order not found")
+    return details[0]
+
+
+@app.get("/reports/revenue", response_model=List[SalesDayResponse])
+async def report_revenue(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Raport przychodu i liczby zamówień w kolejnych dniach.
     
-    items = []
-    total_price = 0
+    Czyta wyłącznie tabelę dziennych podsumowań, więc czas odpowiedzi nie
+    zależy od liczby zamówień w historii.
     
-    for order_item in order.items:
-        product = order_item.product
-        item_total = product.price * order_item.quantity
-        total_price += item_total
-        
-        items.append(OrderItemResponse(
-            product_id=product.id,
-            product_name=product.name,
-            category=order_item.category,
-            quantity=order_item.quantity,
-            price=product.price
-        ))
+    @param date_from Pierwszy dzień (włącznie)
+    @param date_to Ostatni dzień (włącznie)
+    @param db Sesja bazodanowa
+    @return Lista dni z liczbą zamówień i przychodem
+    """
+    return await db.run_sync(sales.revenue_per_day, date_from, date_to)
+
+
+@app.get("/reports/top-flowers", response_model=List[ProductSalesResponse])
+async def report_top_flowers(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Raport najczęściej kupowanych kwiatów.
     
-    return OrderDetailResponse(
-        order_id=order.id,
-        pseudonim=order.pseudonim,
-        data=order.data,
-        godzina=order.godzina,
-        odbior=order.odbior,
-        platnosc=order.platnosc,
-        items=items,
-        total_price=total_price,
-        image_url=order.image_url
-    )
+    @param date_from Pierwszy dzień (włącznie)
+    @param date_to Ostatni dzień (włącznie)
+    @param limit Liczba kwiatów w raporcie
+    @param db Sesja bazodanowa
+    @return Kwiaty posortowane malejąco po sprzedanej ilości
+    """
+    return await db.run_sync(sales.product_sales, ["flower"], date_from, date_to, limit)
+
+
+@app.get("/reports/paper-ribbon-mix", response_model=List[ProductSalesResponse])
+async def report_paper_ribbon_mix(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """!
+    @brief Raport udziału poszczególnych papierów i wstążek w sprzedaży.
+    
+    @param date_from Pierwszy dzień (włącznie)
+    @param date_to Ostatni dzień (włącznie)
+    @param db Sesja bazodanowa
+    @return Papiery i wstążki z ilością, przychodem i udziałem w swojej kategorii
+    """
+    return await db.run_sync(sales.product_sales, ["paper", "ribbon"], date_from, date_to)
@@ -0,0 +1,213 @@
+"""!
+@file metrics.py
+@brief Metryki aplikacji w formacie tekstowym Prometheusa (bez zewnętrznych zależności).
+
+Liczniki i histogramy są aktualizowane w trakcie obsługi żądań, a
+wartości chwilowe (pamięci podręczne, kolejki) są odczytywane z
+zarejestrowanych funkcji dopiero przy generowaniu odpowiedzi /metrics.
+"""
+
+import threading
+from typing import Callable, Dict, List, Tuple
+
+## Przedziały histogramów czasu w sekundach
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+## Typ treści odpowiedzi /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    """!
+    @brief Monotonicznie rosnący licznik z etykietami.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """!
+        @brief Zwiększa licznik o amount dla podanych etykiet.
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """!
+    @brief Histogram obserwacji ze skumulowanymi przedziałami, sumą i liczbą.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        ## etykiety -> [liczności przedziałów, suma, liczba]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        """!
+        @brief Dodaje obserwację dla podanych etykiet.
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """!
+    @brief Wartość chwilowa odczytywana z funkcji przy każdym pobraniu metryk.
+    """
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], object], labelnames: Tuple[str, ...] = ()):
+        """!
+        @param read Funkcja zwracająca liczbę albo (dla labelnames) słownik krotka etykiet -> liczba
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._read = read
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        value = self._read()
+        if not self.labelnames:
+            value = {(): value}
+        for key, item in sorted(value.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(item)}")
+        return lines
+
+
+class Registry:
+    """!
+    @brief Zbiór metryk renderowany razem jako odpowiedź /metrics.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """!
+        @brief Dodaje metrykę do rejestru i ją zwraca.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], object], labelnames: Tuple[str, ...] = ()):
+        """!
+        @brief Rejestruje metrykę chwilową odczytywaną funkcją read.
+        """
+        return self.register(Gauge(name, documentation, read, labelnames))
+
+    def render(self) -> str:
+        """!
+        @brief Zwraca wszystkie metryki w formacie tekstowym Prometheusa.
+
+        Błąd odczytu jednej metryki chwilowej (np. nieosiągalny serwer
+        inferencji) pomija tylko tę metrykę.
+        """
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+
+## Rejestr metryk aplikacji
+registry = Registry()
+
+## Liczba obsłużonych żądań HTTP
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")
+))
+
+## Czas obsługi żądań HTTP
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+))
+
+## Liczba zapytań SQL na żądanie
+http_request_queries = registry.register(Histogram(
+    "http_request_sql_queries", "SQL statements executed per HTTP request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+))
+
+## Łączny czas zapytań SQL na żądanie
+http_request_query_duration = registry.register(Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL statements per HTTP request.", ("route",)
+))
+
+## Czas faz generowania wizualizacji
+visualization_phase = registry.register(Histogram(
+    "visualization_phase_seconds",
+    "Visualization phases: prompt, load, compile, first_inference, text_encode, render (denoise and VAE decode), image_encode.",
+    ("phase",),
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0)
+))
+
+## Renderowania przez WebSocket anulowane nowszą zmianą składu
+websocket_superseded = registry.register(Counter(
+    "visualization_ws_superseded_total", "In-flight WebSocket renders cancelled by a newer composition edit."
+))
@@ -1,9 +1,9 @@
-from typing import List, Optional
-from datetime import date, time
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Time
+from typing import List, Literal, Optional
+from datetime import date, time, datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Time, DateTime, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 Base = declarative_base()
@@ -67,10 +67,26 @@ class Order(Base):
     
     ## Forma płatności (np. "gotówka", "karta", "przelew")
     platnosc = Column(String(50), nullable=True)
+    
+    ## Cena całkowita w groszach wyliczona przy zapisie zamówienia
+    total_price = Column(Integer, nullable=True)
+    
+    ## Czas złożenia zamówienia (dzień sprzedaży w raportach)
+    created_at = Column(DateTime, nullable=True)
+    
+    ## Wizualizacja zaakceptowana przez klienta
+    visualization_id = Column(Integer, ForeignKey("visualizations.id"), nullable=True)
 
     ## Relacja do pozycji zamówienia (kaskadowe usuwanie)
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    ## Indeksy złożone dla stronicowania po (data, godzina, id) z filtrami
+    __table_args__ = (
+        Index("ix_orders_pickup", "data", "godzina", "id"),
+        Index("ix_orders_odbior_pickup", "odbior", "data", "godzina", "id"),
+        Index("ix_orders_platnosc_pickup", "platnosc", "data", "godzina", "id"),
+    )
+
 
 class OrderItem(Base):
     """!
@@ -96,8 +112,11 @@ class OrderItem(Base):
     ## Ilość produktu w pozycji
     quantity = Column(Integer, default=1)
     
+    ## Cena jednostkowa produktu w groszach z chwili złożenia zamówienia
+    unit_price = Column(Integer, nullable=True)
+    
     ## Identyfikator wizualizacji powiązanej z pozycją
-    viz_id = Column(Integer, nullable=True)
+    viz_id = Column(Integer, ForeignKey("visualizations.id"), nullable=True)
     
     ## Relacja do zamówienia nadrzędnego
     order = relationship("Order", back_populates="items")
@@ -106,6 +125,119 @@ class OrderItem(Base):
     product = relationship("Product")
 
 
+class Visualization(Base):
+    """!
+    @brief Wygenerowana wizualizacja bukietu.
+    
+    Przechowuje wszystko, co potrzebne do deterministycznego odtworzenia
+    obrazu (prompt, ziarno, parametry), więc plik może zostać usunięty
+    z pamięci podręcznej i wygenerowany ponownie przy następnym odczycie.
+    """
+    __tablename__ = "visualizations"
+
+    ## Unikalny identyfikator wizualizacji (klucz główny)
+    id = Column(Integer, primary_key=True, index=True)
+    
+    ## Skrót składu bukietu i parametrów (klucz pamięci podręcznej obrazów)
+    composition_key = Column(String(64), nullable=False, unique=True)
+    
+    ## Prompt przekazany do modelu
+    prompt = Column(Text, nullable=False)
+    
+    ## Ziarno szumu początkowego
+    seed = Column(Integer, nullable=False)
+    
+    ## Parametry generowania i kodowania w formacie JSON
+    params = Column(Text, nullable=False)
+    
+    ## Nazwa pliku obrazu w katalogu static/visualizations
+    image_name = Column(String, nullable=False)
+    
+    ## Czas utworzenia wizualizacji
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SalesDay(Base):
+    """!
+    @brief Dzienne podsumowanie sprzedaży aktualizowane przy zapisie zamówień.
+    """
+    __tablename__ = "sales_daily"
+
+    ## Dzień sprzedaży (data złożenia zamówienia)
+    day = Column(Date, primary_key=True)
+    
+    ## Liczba zamówień
+    orders = Column(Integer, nullable=False, default=0)
+    
+    ## Przychód w groszach
+    revenue = Column(Integer, nullable=False, default=0)
+
+
+class SalesDayProduct(Base):
+    """!
+    @brief Dzienna sprzedaż produktu aktualizowana przy zapisie zamówień.
+    
+    Podsumowania kategorii są sumami wierszy tej tabeli, których jest
+    co najwyżej (liczba produktów) na dzień.
+    """
+    __tablename__ = "sales_daily_products"
+
+    ## Dzień sprzedaży
+    day = Column(Date, primary_key=True)
+    
+    ## Identyfikator produktu
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    
+    ## Kategoria produktu w chwili sprzedaży
+    category = Column(String, nullable=False)
+    
+    ## Sprzedana ilość
+    quantity = Column(Integer, nullable=False, default=0)
+    
+    ## Przychód w groszach
+    revenue = Column(Integer, nullable=False, default=0)
+
+    ## Indeks raportów kategorii w zakresie dni
+    __table_args__ = (
+        Index("ix_sales_daily_products_category_day", "category", "day"),
+    )
+
+
+class VisualizationJob(Base):
+    """!
+    @brief Asynchroniczne zadanie generowania wizualizacji.
+    
+    Przechowuje stan zadania z kolejki wizualizacji, aby klient mógł
+    odpytywać o wynik po zwolnieniu połączenia HTTP. Zakończone zadania
+    są usuwane po upływie czasu życia (expires_at).
+    """
+    __tablename__ = "visualization_jobs"
+
+    ## Identyfikator zadania (UUID w postaci szesnastkowej)
+    id = Column(String(32), primary_key=True)
+    
+    ## Stan zadania: queued, running, completed, failed
+    status = Column(String(20), nullable=False, default="queued")
+    
+    ## Parametry zadania w formacie JSON (zwalidowany skład bukietu i opcje kodowania)
+    order_data = Column(Text, nullable=False)
+    
+    ## URL wygenerowanego obrazu (po zakończeniu zadania)
+    image_url = Column(Text, nullable=True)
+    
+    ## Opis błędu dla zadań zakończonych niepowodzeniem
+    error = Column(String, nullable=True)
+    
+    ## Czas utworzenia zadania
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    ## Czas zakończenia zadania
+    finished_at = Column(DateTime, nullable=True)
+    
+    ## Czas, po którym wynik zadania jest usuwany
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+
 # Pydantic Models
 
 class ItemBase(BaseModel):
@@ -167,6 +299,15 @@ class VisualizationRequest(BaseModel):
     
     ## Lista wstążek do wizualizacji
     ribbons: List[RibbonItem] = []
+    
+    ## Format obrazu wynikowego (domyślnie ustawienie serwera)
+    format: Optional[Literal["png", "jpeg", "webp"]] = None
+    
+    ## Jakość kodowania JPEG/WebP w skali 1-100 (domyślnie ustawienie serwera)
+    quality: Optional[int] = Field(None, ge=1, le=100)
+    
+    ## Pseudonim klienta - klucz limitu równoległych renderowań (domyślnie adres IP)
+    pseudonim: Optional[str] = None
 
 
 class VisualizationResponse(BaseModel):
@@ -176,8 +317,65 @@ class VisualizationResponse(BaseModel):
     Zawiera URL do wygenerowanego obrazu bukietu.
     """
     
-    ## URL do wygenerowanego obrazu wizualizacji
+    ## URL do pliku wygenerowanego obrazu (/static/visualizations/<hash>.<rozszerzenie>)
     imageUrl: str
+    
+    ## ID zapisanej wizualizacji do przekazania w CreateOrderRequest.visualization_id
+    ## (None, jeśli zwrócono podgląd zamiast obrazu modelu)
+    id: Optional[int] = None
+    
+    ## Czy imageUrl wskazuje podgląd złożony ze zdjęć produktów (model niedostępny lub przeciążony)
+    preview: bool = False
+
+
+class VisualizationDetailResponse(BaseModel):
+    """!
+    @brief Zapisana wizualizacja wraz z danymi pozwalającymi ją odtworzyć.
+    """
+    
+    ## ID wizualizacji
+    id: int
+    
+    ## Trwały URL obrazu (/api/visualizations/{id}/image), odtwarzanego po usunięciu pliku
+    imageUrl: str
+    
+    ## Prompt przekazany do modelu
+    prompt: str
+    
+    ## Ziarno szumu początkowego
+    seed: int
+    
+    ## Parametry generowania i kodowania
+    params: dict
+    
+    ## Czas utworzenia
+    created_at: datetime
+
+
+class VisualizationJobResponse(BaseModel):
+    """!
+    @brief Stan asynchronicznego zadania generowania wizualizacji.
+    
+    Zwracany zarówno przy zgłoszeniu zadania, jak i przy odpytywaniu o wynik.
+    """
+    
+    ## Identyfikator zadania
+    job_id: str
+    
+    ## Stan zadania: queued, running, completed, failed
+    status: str
+    
+    ## Pozycja w kolejce (tylko dla zadań oczekujących)
+    position: Optional[int] = None
+    
+    ## URL do wygenerowanego obrazu (tylko dla zadań zakończonych)
+    imageUrl: Optional[str] = None
+    
+    ## URL podglądu złożonego ze zdjęć produktów (tylko przy zgłoszeniu zadania)
+    previewUrl: Optional[str] = None
+    
+    ## Opis błędu (tylko dla zadań zakończonych niepowodzeniem)
+    error: Optional[str] = None
 
 
 class CreateOrderRequest(BaseModel):
@@ -214,6 +412,9 @@ class CreateOrderRequest(BaseModel):
     
     ## ID wcześniej wygenerowanej wizualizacji (jeśli istnieje)
     visualization_id: Optional[int] = None
+    
+    ## URL wygenerowanej wizualizacji (/static/visualizations/...), nie data URL
+    image_url: Optional[str] = Field(None, max_length=2048)
 
 
 class CreateOrderResponse(BaseModel):
@@ -230,6 +431,50 @@ class CreateOrderResponse(BaseModel):
     message: str
 
 
+class BulkOrderRequest(BaseModel):
+    """!
+    @brief Żądanie zapisania wielu zamówień naraz (import z kanałów telefonicznych i B2B).
+    """
+    
+    ## Zamówienia w formacie pojedynczego POST /orders
+    orders: List[CreateOrderRequest]
+
+
+class BulkOrderResult(BaseModel):
+    """!
+    @brief Wynik zapisu jednego zamówienia z importu zbiorczego.
+    
+    Dokładnie jedno z pól order_id i error jest ustawione.
+    """
+    
+    ## Pozycja zamówienia w liście żądania
+    index: int
+    
+    ## Identyfikator utworzonego zamówienia
+    order_id: Optional[int] = None
+    
+    ## Kod HTTP błędu walidacji, jaki zwróciłby POST /orders
+    status_code: Optional[int] = None
+    
+    ## Opis błędu walidacji
+    error: Optional[str] = None
+
+
+class BulkOrderResponse(BaseModel):
+    """!
+    @brief Odpowiedź na import zbiorczy zamówień.
+    """
+    
+    ## Liczba zapisanych zamówień
+    created: int
+    
+    ## Liczba odrzuconych zamówień
+    failed: int
+    
+    ## Wyniki w kolejności zamówień z żądania
+    results: List[BulkOrderResult]
+
+
 class OrderItemResponse(BaseModel):
     """!
     @brief Model pozycji zamówienia w odpowiedzi API.
@@ -287,3 +532,59 @@ class OrderDetailResponse(BaseModel):
     
     ## URL do wizualizacji bukietu
     image_url: Optional[str] = None
+    
+    ## ID zapisanej wizualizacji bukietu
+    visualization_id: Optional[int] = None
+
+
+class OrderListResponse(BaseModel):
+    """!
+    @brief Lista szczegółów wielu zamówień.
+    
+    Przy stronicowaniu zawiera kursor następnej strony.
+    """
+    
+    ## Szczegóły zamówień
+    orders: List[OrderDetailResponse]
+    
+    ## Kursor do pobrania następnej strony (None na ostatniej stronie)
+    next_cursor: Optional[str] = None
+
+
+class SalesDayResponse(BaseModel):
+    """!
+    @brief Sprzedaż jednego dnia w raporcie przychodów.
+    """
+    
+    ## Dzień sprzedaży
+    day: date
+    
+    ## Liczba zamówień
+    orders: int
+    
+    ## Przychód w groszach
+    revenue: int
+
+
+class ProductSalesResponse(BaseModel):
+    """!
+    @brief Sprzedaż produktu w raportach top kwiatów i udziału papierów/wstążek.
+    """
+    
+    ## ID produktu
+    product_id: int
+    
+    ## Nazwa produktu
+    name: str
+    
+    ## Kategoria produktu
+    category: str
+    
+    ## Sprzedana ilość
+    quantity: int
+    
+    ## Przychód w groszach
+    revenue: int
+    
+    ## Udział w ilości sprzedanej w obrębie kategorii (0-1)
+    share: float
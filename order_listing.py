@@ -0,0 +1,206 @@
+"""!
+@file order_listing.py
+@brief Stronicowanie kluczem (keyset) i strumieniowy eksport zamówień.
+
+Zamówienia są porządkowane po (data, godzina, id). Kolumny data i godzina
+mogą być NULL - takie wartości SQLite sortuje jako najmniejsze, więc
+warunek "po kursorze" obsługuje je jawnie.
+"""
+
+import base64
+import csv
+import io
+import json
+from datetime import date, time
+from typing import Iterator, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from models import Order, OrderItem, Product
+
+
+## Kolumny eksportu zamówień (jeden wiersz na pozycję zamówienia)
+EXPORT_COLUMNS = [
+    "order_id", "pseudonim", "data", "godzina", "odbior", "platnosc", "image_url",
+    "product_id", "product_name", "category", "quantity", "price",
+]
+
+
+class InvalidCursor(ValueError):
+    """!
+    @brief Zgłaszany, gdy kursor stronicowania nie daje się zdekodować.
+    """
+
+
+def encode_cursor(order: tuple) -> str:
+    """!
+    @brief Koduje pozycję (data, godzina, id) ostatniego zamówienia strony.
+
+    @param order Krotka (data, godzina, id)
+    @return Nieprzezroczysty kursor base64url
+    """
+    data, godzina, order_id = order
+    payload = [data.isoformat() if data else None, godzina.isoformat() if godzina else None, order_id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """!
+    @brief Dekoduje kursor utworzony przez encode_cursor.
+
+    @param cursor Kursor base64url
+    @return Krotka (data, godzina, id)
+    @throws InvalidCursor jeśli kursor jest niepoprawny
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data, godzina, order_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (
+            date.fromisoformat(data) if data else None,
+            time.fromisoformat(godzina) if godzina else None,
+            int(order_id),
+        )
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _after(column, value):
+    return column.isnot(None) if value is None else column > value
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def order_filters(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    odbior: Optional[str] = None,
+    platnosc: Optional[str] = None
+) -> list:
+    """!
+    @brief Buduje warunki WHERE dla filtrów listy zamówień.
+
+    @param date_from Najwcześniejsza data odbioru (włącznie)
+    @param date_to Najpóźniejsza data odbioru (włącznie)
+    @param odbior Sposób odbioru
+    @param platnosc Forma płatności
+    @return Lista wyrażeń SQLAlchemy
+    """
+    conditions = []
+    if date_from is not None:
+        conditions.append(Order.data >= date_from)
+    if date_to is not None:
+        conditions.append(Order.data <= date_to)
+    if odbior is not None:
+        conditions.append(Order.odbior == odbior)
+    if platnosc is not None:
+        conditions.append(Order.platnosc == platnosc)
+    return conditions
+
+
+def page_order_keys(db: Session, conditions: list, cursor: Optional[str], limit: int) -> tuple:
+    """!
+    @brief Wyznacza ID zamówień jednej strony listy.
+
+    @param db Sesja bazodanowa
+    @param conditions Warunki z order_filters
+    @param cursor Kursor poprzedniej strony lub None
+    @param limit Rozmiar strony
+    @return Para (lista ID zamówień, kursor następnej strony lub None)
+    @throws InvalidCursor jeśli kursor jest niepoprawny
+    """
+    query = select(Order.data, Order.godzina, Order.id).where(*conditions)
+    if cursor:
+        data, godzina, order_id = decode_cursor(cursor)
+        query = query.where(or_(
+            _after(Order.data, data),
+            and_(_equal(Order.data, data), or_(
+                _after(Order.godzina, godzina),
+                and_(_equal(Order.godzina, godzina), Order.id > order_id)
+            ))
+        ))
+    query = query.order_by(Order.data, Order.godzina, Order.id).limit(limit + 1)
+
+    rows = db.execute(query).all()
+    next_cursor = encode_cursor(tuple(rows[limit - 1])) if len(rows) > limit else None
+    return [row.id for row in rows[:limit]], next_cursor
+
+
+def export_rows(db: Session, conditions: list, batch_size: int = 500) -> Iterator[dict]:
+    """!
+    @brief Strumieniuje pozycje zamówień kursorem po stronie serwera.
+
+    Zamówienia bez pozycji są zwracane jako pojedynczy wiersz z pustymi
+    kolumnami produktu. Pamięć nie zależy od liczby zamówień.
+
+    @param db Sesja bazodanowa
+    @param conditions Warunki z order_filters
+    @param batch_size Liczba wierszy pobieranych z kursora naraz
+    @return Iterator słowników z kluczami EXPORT_COLUMNS
+    """
+    query = (
+        select(
+            Order.id.label("order_id"), Order.pseudonim, Order.data, Order.godzina,
+            Order.odbior, Order.platnosc, Order.image_url,
+            OrderItem.product_id, Product.name.label("product_name"), OrderItem.category,
+            OrderItem.quantity, OrderItem.unit_price.label("price")
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(*conditions)
+        .order_by(Order.data, Order.godzina, Order.id, OrderItem.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in db.execute(query):
+        record = row._asdict()
+        for key in ("data", "godzina"):
+            if record[key] is not None:
+                record[key] = record[key].isoformat()
+        yield record
+
+
+def to_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    """!
+    @brief Formatuje wiersze eksportu jako NDJSON (jeden obiekt JSON na linię).
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def to_csv(rows: Iterator[dict]) -> Iterator[str]:
+    """!
+    @brief Formatuje wiersze eksportu jako CSV z nagłówkiem.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def chunked(lines: Iterator[str], size: int = 64 * 1024) -> Iterator[bytes]:
+    """!
+    @brief Łączy linie eksportu w większe porcje, aby ograniczyć liczbę zapisów do gniazda.
+
+    @param lines Iterator linii tekstu
+    @param size Przybliżony rozmiar porcji w bajtach
+    @return Iterator porcji zakodowanych w UTF-8
+    """
+    buffer = []
+    buffered = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
@@ -0,0 +1,222 @@
+"""!
+@file product_images.py
+@brief Pomniejszone warianty zdjęć produktów (WebP/JPEG) generowane na żądanie.
+
+Oryginały w katalogu images/ mają ok. 2 MB, a siatka katalogu pokazuje
+małe kafelki. Warianty o stałych szerokościach są generowane przy pierwszym
+żądaniu (lub przy starcie) i przechowywane na dysku obok siebie.
+"""
+
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+from http_cache import file_etag
+from image_encoding import IMAGE_EXTENSIONS, encode_image
+
+
+## Katalog z oryginalnymi zdjęciami produktów
+SOURCE_DIR = Path("images")
+
+## Katalog z wygenerowanymi wariantami
+DERIVATIVES_DIR = Path("static/derivatives")
+
+## Dozwolone szerokości wariantów w pikselach
+ALLOWED_WIDTHS = (128, 256, 512, 1024)
+
+## Formaty wariantów
+VARIANT_FORMATS = ("webp", "jpeg")
+
+## Jakość kodowania wariantów (zmienna PRODUCT_IMAGE_QUALITY)
+VARIANT_QUALITY = int(os.getenv("PRODUCT_IMAGE_QUALITY", "80"))
+
+## Blokady generowania, po jednej na plik wariantu
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def source_path(filename: str) -> Optional[Path]:
+    """!
+    @brief Zwraca ścieżkę oryginału, odrzucając nazwy wychodzące poza SOURCE_DIR.
+
+    @param filename Nazwa pliku z URL
+    @return Ścieżka pliku lub None, jeśli nie istnieje
+    """
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        return None
+    path = SOURCE_DIR / filename
+    return path if path.is_file() else None
+
+
+def snap_width(width: int) -> int:
+    """!
+    @brief Zaokrągla żądaną szerokość w górę do najbliższej dozwolonej.
+
+    @param width Żądana szerokość
+    @return Szerokość z ALLOWED_WIDTHS
+    """
+    for allowed in ALLOWED_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return ALLOWED_WIDTHS[-1]
+
+
+def negotiate_format(requested: Optional[str], accept: str) -> str:
+    """!
+    @brief Wybiera format wariantu na podstawie parametru lub nagłówka Accept.
+
+    @param requested Format z parametru zapytania (webp, jpeg) lub None
+    @param accept Nagłówek Accept żądania
+    @return webp lub jpeg
+    """
+    if requested in VARIANT_FORMATS:
+        return requested
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def variant_path(source: Path, width: int, image_format: str) -> Path:
+    """!
+    @brief Zwraca ścieżkę wariantu, generując go, jeśli nie istnieje lub jest starszy od oryginału.
+
+    @param source Ścieżka oryginału
+    @param width Szerokość z ALLOWED_WIDTHS
+    @param image_format webp lub jpeg
+    @return Ścieżka pliku wariantu
+    """
+    path = DERIVATIVES_DIR / f"{source.stem}-{width}.{IMAGE_EXTENSIONS[image_format]}"
+    source_mtime = source.stat().st_mtime
+    if path.exists() and path.stat().st_mtime >= source_mtime:
+        return path
+
+    with _lock_for(path):
+        if path.exists() and path.stat().st_mtime >= source_mtime:
+            return path
+        with Image.open(source) as image:
+            image.load()
+            if image.width > width:
+                height = round(image.height * width / image.width)
+                image = image.resize((width, height), Image.LANCZOS)
+            if image_format == "jpeg" and image.mode in ("RGBA", "LA", "P"):
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+                image = background
+            data = encode_image(image, image_format, VARIANT_QUALITY)
+
+        DERIVATIVES_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+def pregenerate():
+    """!
+    @brief Generuje wszystkie warianty wszystkich zdjęć produktów.
+
+    Wywoływana w tle przy starcie, gdy ustawiono PRODUCT_IMAGE_PREGENERATE=1.
+    """
+    for source in sorted(SOURCE_DIR.glob("*.png")):
+        for width in ALLOWED_WIDTHS:
+            for image_format in VARIANT_FORMATS:
+                variant_path(source, width, image_format)
+
+
+class ImageFile:
+    """!
+    @brief Metadane pliku zdjęcia produktu przechowywane w indeksie katalogu.
+    """
+
+    __slots__ = ("path", "size", "mtime", "etag", "media_type")
+
+    def __init__(self, path: Path, stat: os.stat_result):
+        ## Ścieżka pliku
+        self.path = path
+        ## Rozmiar w bajtach
+        self.size = stat.st_size
+        ## Czas modyfikacji (timestamp)
+        self.mtime = stat.st_mtime
+        ## ETag wyznaczony z czasu modyfikacji i rozmiaru
+        self.etag = file_etag(stat)
+        ## Typ MIME
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def image_file(filename: Optional[str]) -> Optional[ImageFile]:
+    """!
+    @brief Odczytuje metadane zdjęcia produktu.
+
+    @param filename Nazwa pliku w SOURCE_DIR
+    @return Metadane lub None, jeśli plik nie istnieje
+    """
+    path = source_path(filename) if filename else None
+    if path is None:
+        return None
+    return ImageFile(path, path.stat())
+
+
+class HotFileCache:
+    """!
+    @brief Ograniczona rozmiarem pamięć podręczna LRU zawartości najczęściej pobieranych zdjęć.
+    """
+
+    def __init__(self, max_bytes: int):
+        """!
+        @param max_bytes Budżet pamięci w bajtach
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        ## (ścieżka, czas modyfikacji) -> zawartość pliku
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, image: ImageFile) -> bytes:
+        """!
+        @brief Zwraca zawartość pliku z pamięci lub z dysku (z zapamiętaniem).
+
+        @param image Metadane pliku
+        @return Zawartość pliku
+        """
+        key = (image.path, image.mtime)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = image.path.read_bytes()
+        if len(data) > self.max_bytes:
+            return data
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return data
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca liczniki trafień i zajętość pamięci.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._size}
+
+
+## Pamięć podręczna zawartości zdjęć produktów (zmienna PRODUCT_IMAGE_CACHE_MB)
+hot_cache = HotFileCache(int(float(os.getenv("PRODUCT_IMAGE_CACHE_MB", "64")) * 1024 * 1024))
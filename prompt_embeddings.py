@@ -0,0 +1,108 @@
+"""!
+@file prompt_embeddings.py
+@brief Pamięć podręczna LRU wyników kodera tekstu (CLIP) dla promptów wizualizacji.
+
+Katalog ma kilkadziesiąt produktów, więc prompty tworzone przez
+create_prompt_from_order często się powtarzają. Zapamiętane osadzenia
+są przekazywane do pipeline'u jako prompt_embeds, dzięki czemu przy
+trafieniu jedynym kosztem żądania jest odszumianie i dekodowanie obrazu.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+import numpy
+
+
+def concat(parts: list):
+    """!
+    @brief Łączy osadzenia (tensory torch lub tablice numpy) wzdłuż wymiaru partii.
+    """
+    if hasattr(parts[0], "detach"):
+        import torch
+        return torch.cat(parts)
+    return numpy.concatenate(parts)
+
+
+class PromptEmbeddingCache:
+    """!
+    @brief Ograniczona liczbą wpisów pamięć LRU osadzeń promptów z licznikami trafień i czasu kodera.
+    """
+
+    def __init__(self, max_entries: int):
+        """!
+        @param max_entries Maksymalna liczba zapamiętanych promptów (0 wyłącza pamięć)
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        ## prompt -> osadzenie o kształcie (1, tokeny, wymiar)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.encode_calls = 0
+        self.encode_ms_total = 0.0
+
+    def embed(self, encode: Callable[[List[str]], object], prompts: List[str]) -> tuple:
+        """!
+        @brief Zwraca osadzenia promptów, kodując jednym wywołaniem tylko brakujące.
+
+        @param encode Funkcja kodująca listę promptów w osadzenia o kształcie (len, tokeny, wymiar)
+        @param prompts Lista promptów (powtórzenia są kodowane raz)
+        @return Para (osadzenia w kolejności prompts, słownik prompt -> raport
+                {"prompt_cache": "hit"/"miss", "encode_ms": czas kodera partii})
+        """
+        unique = list(dict.fromkeys(prompts))
+        found = {}
+        with self._lock:
+            for prompt in unique:
+                embedding = self._entries.get(prompt)
+                if embedding is not None:
+                    self._entries.move_to_end(prompt)
+                    found[prompt] = embedding
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+
+        missing = [prompt for prompt in unique if prompt not in found]
+        missing_set = set(missing)
+        encode_ms = 0.0
+        if missing:
+            start = time.perf_counter()
+            encoded = encode(missing)
+            encode_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.encode_calls += 1
+                self.encode_ms_total += encode_ms
+                for index, prompt in enumerate(missing):
+                    found[prompt] = encoded[index:index + 1]
+                    if self.max_entries > 0:
+                        self._entries[prompt] = found[prompt]
+                        self._entries.move_to_end(prompt)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        reports = {
+            prompt: {
+                "prompt_cache": "miss" if prompt in missing_set else "hit",
+                "encode_ms": round(encode_ms, 1) if prompt in missing_set else 0.0,
+            }
+            for prompt in unique
+        }
+        return concat([found[prompt] for prompt in prompts]), reports
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca liczniki trafień, współczynnik trafień i czas kodera.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encode_calls": self.encode_calls,
+                "avg_encode_ms": self.encode_ms_total / self.encode_calls if self.encode_calls else 0.0,
+            }
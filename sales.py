@@ -0,0 +1,221 @@
+"""!
+@file sales.py
+@brief Wstępnie zagregowane podsumowania sprzedaży i raporty na ich podstawie.
+
+Przy zapisie zamówienia do tabel sales_daily i sales_daily_products
+dodawane są (upsertem) ilości i przychody, więc raporty czytają co
+najwyżej (dni x produkty) wierszy niezależnie od liczby zamówień.
+Dniem sprzedaży jest data złożenia zamówienia (Order.created_at).
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import Date, delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import Order, OrderItem, Product, SalesDay, SalesDayProduct
+
+
+def record_sales(db: Session, orders: List[tuple]):
+    """!
+    @brief Dolicza zapisywane zamówienia do dziennych podsumowań sprzedaży.
+
+    Wywoływana w tej samej transakcji co zapis zamówień - dwa polecenia
+    executemany niezależnie od liczby zamówień.
+
+    @param db Sesja bazodanowa
+    @param orders Lista krotek (dzień, cena całkowita, wiersze OrderItem z unit_price)
+    """
+    days = defaultdict(lambda: [0, 0])
+    products = {}
+    for day, total_price, item_rows in orders:
+        days[day][0] += 1
+        days[day][1] += total_price
+        for row in item_rows:
+            key = (day, row["product_id"])
+            entry = products.setdefault(key, {
+                "day": day, "product_id": row["product_id"], "category": row["category"],
+                "quantity": 0, "revenue": 0,
+            })
+            entry["quantity"] += row["quantity"]
+            entry["revenue"] += row["quantity"] * row["unit_price"]
+
+    if days:
+        _upsert_increments(
+            db, SalesDay, ["day"], ["orders", "revenue"],
+            [{"day": day, "orders": count, "revenue": revenue} for day, (count, revenue) in days.items()]
+        )
+    if products:
+        _upsert_increments(db, SalesDayProduct, ["day", "product_id"], ["quantity", "revenue"], list(products.values()))
+
+
+def _upsert_increments(db: Session, model, keys: List[str], columns: List[str], rows: List[dict]):
+    """!
+    @brief Wstawia wiersze, a przy konflikcie klucza dodaje ich wartości columns do istniejących.
+
+    SQLite i PostgreSQL używają ON CONFLICT DO UPDATE, MySQL/MariaDB -
+    ON DUPLICATE KEY UPDATE (po jednym poleceniu executemany). Dla innych
+    baz każdy wiersz jest najpierw aktualizowany, a wstawiany, jeśli nie istniał.
+
+    @param db Sesja bazodanowa
+    @param model Tabela podsumowań (SalesDay lub SalesDayProduct)
+    @param keys Kolumny klucza unikalnego
+    @param columns Kolumny zwiększane o wartości z rows
+    @param rows Wiersze do dodania
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = upsert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=[getattr(model, key) for key in keys],
+            set_={column: getattr(model, column) + statement.excluded[column] for column in columns}
+        )
+    elif dialect in ("mysql", "mariadb"):
+        statement = mysql_insert(model)
+        statement = statement.on_duplicate_key_update(
+            {column: getattr(model, column) + statement.inserted[column] for column in columns}
+        )
+    else:
+        for row in rows:
+            result = db.execute(
+                update(model)
+                .where(*(getattr(model, key) == row[key] for key in keys))
+                .values({column: getattr(model, column) + row[column] for column in columns})
+            )
+            if result.rowcount == 0:
+                db.execute(insert(model), row)
+        return
+    db.execute(statement, rows)
+
+
+def backfill(db: Session):
+    """!
+    @brief Uzupełnia ceny i podsumowania dla zamówień zapisanych przed ich wprowadzeniem.
+
+    Pozycje bez unit_price dostają bieżącą cenę produktu, zamówienia bez
+    total_price - sumę pozycji. Jeśli tabele podsumowań są puste, a
+    zamówienia istnieją, podsumowania są przeliczane od zera (dla starych
+    zamówień bez created_at dniem sprzedaży jest data odbioru).
+
+    @param db Sesja bazodanowa
+    """
+    db.execute(
+        update(OrderItem)
+        .where(OrderItem.unit_price.is_(None))
+        .values(unit_price=select(Product.price).where(Product.id == OrderItem.product_id).scalar_subquery())
+    )
+    db.execute(
+        update(Order)
+        .where(Order.total_price.is_(None))
+        .values(total_price=func.coalesce(
+            select(func.sum(OrderItem.unit_price * OrderItem.quantity))
+            .where(OrderItem.order_id == Order.id)
+            .scalar_subquery(),
+            0
+        ))
+    )
+    if db.scalar(select(func.count()).select_from(SalesDay)) == 0 and db.scalar(select(func.count(Order.id))):
+        rebuild(db)
+    db.commit()
+
+
+def rebuild(db: Session):
+    """!
+    @brief Przelicza tabele podsumowań od zera na podstawie zamówień i pozycji.
+
+    @param db Sesja bazodanowa
+    """
+    # date() z typem Date: w SQLite zwraca tekst RRRR-MM-DD, a CAST(... AS DATE)
+    # dałby tam liczbę (powinowactwo NUMERIC); PostgreSQL i MySQL zwracają datę
+    day = func.coalesce(func.date(Order.created_at, type_=Date), Order.data)
+    db.execute(delete(SalesDay))
+    db.execute(delete(SalesDayProduct))
+    db.execute(insert(SalesDay).from_select(
+        ["day", "orders", "revenue"],
+        select(day, func.count(Order.id), func.sum(Order.total_price))
+        .where(day.isnot(None))
+        .group_by(day)
+    ))
+    db.execute(insert(SalesDayProduct).from_select(
+        ["day", "product_id", "category", "quantity", "revenue"],
+        select(
+            day, OrderItem.product_id, func.max(OrderItem.category),
+            func.sum(OrderItem.quantity), func.sum(OrderItem.quantity * OrderItem.unit_price)
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(day.isnot(None))
+        .group_by(day, OrderItem.product_id)
+    ))
+
+
+def _in_range(column, date_from: Optional[date], date_to: Optional[date]) -> list:
+    conditions = []
+    if date_from is not None:
+        conditions.append(column >= date_from)
+    if date_to is not None:
+        conditions.append(column <= date_to)
+    return conditions
+
+
+def revenue_per_day(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[dict]:
+    """!
+    @brief Zwraca liczbę zamówień i przychód w kolejnych dniach.
+
+    @param db Sesja bazodanowa
+    @param date_from Pierwszy dzień (włącznie)
+    @param date_to Ostatni dzień (włącznie)
+    @return Lista słowników day, orders, revenue
+    """
+    rows = db.execute(
+        select(SalesDay.day, SalesDay.orders, SalesDay.revenue)
+        .where(*_in_range(SalesDay.day, date_from, date_to))
+        .order_by(SalesDay.day)
+    )
+    return [row._asdict() for row in rows]
+
+
+def product_sales(
+    db: Session,
+    categories: List[str],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """!
+    @brief Zwraca sprzedaż produktów z wybranych kategorii, od najczęściej kupowanych.
+
+    @param db Sesja bazodanowa
+    @param categories Kategorie produktów (flower, foliage, paper, ribbon)
+    @param date_from Pierwszy dzień (włącznie)
+    @param date_to Ostatni dzień (włącznie)
+    @param limit Maksymalna liczba produktów (None - wszystkie)
+    @return Lista słowników product_id, name, category, quantity, revenue, share
+            (udział w ilości zwróconych produktów tej samej kategorii)
+    """
+    quantity = func.sum(SalesDayProduct.quantity)
+    query = (
+        select(
+            SalesDayProduct.product_id, Product.name, SalesDayProduct.category,
+            quantity.label("quantity"), func.sum(SalesDayProduct.revenue).label("revenue")
+        )
+        .join(Product, Product.id == SalesDayProduct.product_id)
+        .where(SalesDayProduct.category.in_(categories), *_in_range(SalesDayProduct.day, date_from, date_to))
+        .group_by(SalesDayProduct.product_id, Product.name, SalesDayProduct.category)
+        .order_by(quantity.desc(), SalesDayProduct.product_id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    rows = [row._asdict() for row in db.execute(query)]
+
+    totals = defaultdict(int)
+    for row in rows:
+        totals[row["category"]] += row["quantity"]
+    for row in rows:
+        row["share"] = round(row["quantity"] / totals[row["category"]], 4) if totals[row["category"]] else 0.0
+    return rows
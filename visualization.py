@@ -4,73 +4,587 @@
 """
 
 import os
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import uuid
 from pathlib import Path
-from optimum.intel import OVStableDiffusionPipeline
-import torch
-from optimum.intel.openvino.modeling_diffusion import OVStableDiffusionPipeline
-import io
-import base64
+from typing import Optional
+from visualization_cache import VisualizationCache, composition_key
+from batching import MicroBatcher
+from image_encoding import IMAGE_EXTENSIONS, encode_image
+from prompt_embeddings import PromptEmbeddingCache
+from inference_server import InferenceClient
+from admission import AdmissionController, AdmissionRejected
+from metrics import visualization_phase
+import composite
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 ## Katalog przechowywania wygenerowanych wizualizacji
 IMAGES_DIR = Path("static/visualizations")
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
+## Ścieżka URL, pod którą serwowane są pliki z IMAGES_DIR
+IMAGES_URL = "/static/visualizations"
+
+## Identyfikator modelu w repozytorium Hugging Face
+MODEL_ID = "rupeshs/sdxs-512-0.9-openvino"
+
+## Parametry generowania obrazu (wchodzą w skład klucza pamięci podręcznej)
+GENERATION_PARAMS = {
+    "width": 512,
+    "height": 512,
+    "num_inference_steps": 1,
+    "guidance_scale": 1.0,
+}
+
+## Funkcja "moduł:funkcja" tworząca pipeline zamiast modelu OpenVINO, np. zaślepka
+## benchmarks/stub_pipeline.py (zmienna VISUALIZATION_PIPELINE_LOADER)
+PIPELINE_LOADER = os.getenv("VISUALIZATION_PIPELINE_LOADER", "")
+
+## Katalog trwałej pamięci podręcznej skompilowanych modeli OpenVINO (zmienna OPENVINO_CACHE_DIR)
+MODEL_CACHE_DIR = Path(os.getenv("OPENVINO_CACHE_DIR", "model_cache"))
+
+## Czy rozgrzewać model przy starcie aplikacji (zmienna VISUALIZATION_WARMUP)
+VISUALIZATION_WARMUP = os.getenv("VISUALIZATION_WARMUP", "0").lower() in ("1", "true", "yes")
+
+## Domyślny format zapisu wizualizacji: png, jpeg lub webp (zmienna VISUALIZATION_FORMAT)
+DEFAULT_IMAGE_FORMAT = os.getenv("VISUALIZATION_FORMAT", "webp").lower()
+
+## Domyślna jakość kodowania JPEG/WebP (zmienna VISUALIZATION_QUALITY)
+DEFAULT_IMAGE_QUALITY = int(os.getenv("VISUALIZATION_QUALITY", "85"))
+
+if DEFAULT_IMAGE_FORMAT not in IMAGE_EXTENSIONS:
+    raise ValueError(f"Unsupported VISUALIZATION_FORMAT: {DEFAULT_IMAGE_FORMAT}")
+
+## Miejsce wykonywania inferencji: local (w tym procesie) lub remote (inference_server.py) - zmienna VISUALIZATION_BACKEND
+VISUALIZATION_BACKEND = os.getenv("VISUALIZATION_BACKEND", "local").lower()
+
+if VISUALIZATION_BACKEND not in ("local", "remote"):
+    raise ValueError(f"Unsupported VISUALIZATION_BACKEND: {VISUALIZATION_BACKEND}")
+
+## Ścieżka gniazda Unix serwera inferencji (zmienna INFERENCE_SOCKET)
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "inference.sock")
+
+## Wspólny klucz uwierzytelniania połączeń z serwerem inferencji (zmienna INFERENCE_AUTHKEY)
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode() or None
+
+## Liczba wątków wykonujących inferencję modelu (zmienna VISUALIZATION_WORKERS)
+VISUALIZATION_WORKERS = max(1, int(os.getenv("VISUALIZATION_WORKERS", "1")))
+
 ## Globalny obiekt pipeline'u modelu (lazy loading)
 _pipe = None
 
+## Blokada chroniąca jednokrotne ładowanie modelu z wielu wątków
+_pipe_lock = threading.Lock()
+
+## Stan modelu: unloaded, loading, compiling, warming, ready, failed
+model_state = "unloaded"
+
+## Czy próbna inferencja rozgrzewająca zakończyła się powodzeniem
+warmup_done = False
+
+## Czasy kolejnych faz zimnego startu w milisekundach
+cold_start_timings = {}
+
+## Klient serwera inferencji przy VISUALIZATION_BACKEND=remote (INFERENCE_CONNECTIONS, INFERENCE_TIMEOUT_SECONDS)
+inference_client = InferenceClient(
+    INFERENCE_SOCKET,
+    INFERENCE_AUTHKEY,
+    connections=int(os.getenv("INFERENCE_CONNECTIONS", "8")),
+    timeout=float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "120"))
+) if VISUALIZATION_BACKEND == "remote" else None
+
+## Pula wątków, w której wykonywana jest inferencja poza pętlą zdarzeń
+_executor = ThreadPoolExecutor(
+    max_workers=VISUALIZATION_WORKERS,
+    thread_name_prefix="visualization"
+)
+
+## Pamięć podręczna wygenerowanych obrazów (pliki w IMAGES_DIR)
+cache = VisualizationCache(
+    IMAGES_DIR,
+    disk_bytes=int(float(os.getenv("VISUALIZATION_CACHE_DISK_MB", "1024")) * 1024 * 1024),
+    max_age=float(os.getenv("VISUALIZATION_CACHE_MAX_AGE_HOURS", "168")) * 3600
+)
+
+
+## Pamięć podręczna osadzeń promptów (zmienna PROMPT_EMBEDDING_CACHE_SIZE, liczba promptów)
+prompt_cache = PromptEmbeddingCache(int(os.getenv("PROMPT_EMBEDDING_CACHE_SIZE", "128")))
+
+
+def _set_state(state: str):
+    global model_state
+    model_state = state
+
+
+def _timed_phase(name: str, func):
+    """!
+    @brief Wykonuje fazę zimnego startu, zapisując i logując jej czas.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - start) * 1000
+    cold_start_timings[name] = round(elapsed, 1)
+    visualization_phase.observe(elapsed / 1000, phase=name)
+    logger.info("Cold start phase '%s' took %.1f ms", name, elapsed)
+    return result
+
+
+def _load_pipeline():
+    if PIPELINE_LOADER:
+        module_name, _, function_name = PIPELINE_LOADER.partition(":")
+        return getattr(importlib.import_module(module_name), function_name)(MODEL_ID)
+    
+    from optimum.intel.openvino.modeling_diffusion import OVStableDiffusionPipeline
+    
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return OVStableDiffusionPipeline.from_pretrained(
+        MODEL_ID,
+        ov_config={"CACHE_DIR": str(MODEL_CACHE_DIR)},
+        compile=False
+    )
+
 
 def get_model():
     """!
-    @brief Ładuje model SDXS-512 OpenVINO przy pierwszym wywołaniu.
+    @brief Ładuje i kompiluje model SDXS-512 OpenVINO przy pierwszym wywołaniu.
+    
+    Skompilowane modele są zapisywane w MODEL_CACHE_DIR, więc po restarcie
+    kompilacja sprowadza się do odczytu z dysku. Przy ustawionym
+    VISUALIZATION_PIPELINE_LOADER pipeline tworzy wskazana funkcja.
     
     @return Pipeline modelu Stable Diffusion
-    @note Model jest ładowany tylko raz i przechowywany w pamięci
+    @note Model jest ładowany tylko raz i przechowywany w pamięci. torch
+          i optimum są importowane dopiero tutaj, więc proces API z
+          VISUALIZATION_BACKEND=remote ich nie ładuje.
     """
     global _pipe
     if _pipe is None:
-        print("Loading SDXS-512 OpenVINO model...")
-        _pipe = OVStableDiffusionPipeline.from_pretrained(
-            "rupeshs/sdxs-512-0.9-openvino",
-            ov_config={"CACHE_DIR": ""}
-        )
-        print("Model loaded!")
+        with _pipe_lock:
+            if _pipe is None:
+                try:
+                    _set_state("loading")
+                    logger.info("Loading SDXS-512 OpenVINO model...")
+                    pipe = _timed_phase("load", _load_pipeline)
+                    _set_state("compiling")
+                    _timed_phase("compile", pipe.compile)
+                except Exception:
+                    _set_state("failed")
+                    raise
+                _pipe = pipe
+                _set_state("ready")
+                logger.info("Model loaded!")
     return _pipe
 
 
-async def generate_bouquet_visualization(order_data: dict) -> str:
+def warmup():
     """!
-    @brief Generuje wizualizację bukietu na podstawie danych zamówienia.
+    @brief Ładuje, kompiluje i wykonuje jedną próbną inferencję modelu.
+    
+    Wywoływana przy starcie aplikacji, gdy ustawiono VISUALIZATION_WARMUP,
+    aby pierwszy klient nie ponosił kosztu zimnego startu.
+    """
+    global warmup_done
+    start = time.perf_counter()
+    try:
+        pipe = get_model()
+        _set_state("warming")
+        _timed_phase("first_inference", lambda: pipe(prompt="bouquet of flowers", **GENERATION_PARAMS))
+    except Exception as e:
+        _set_state("failed")
+        logger.error("Model warmup failed: %s", e)
+        return
+    _set_state("ready")
+    warmup_done = True
+    logger.info("Model warmup finished in %.1f ms", (time.perf_counter() - start) * 1000)
+
+
+async def start_warmup():
+    """!
+    @brief Uruchamia rozgrzewanie modelu w puli wątków inferencji.
+    
+    Kolejne renderowania czekają w puli, aż rozgrzewanie się zakończy.
+    Przy VISUALIZATION_BACKEND=remote model rozgrzewa serwer inferencji.
+    """
+    if inference_client is not None:
+        return
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_executor, warmup)
+
+
+def readiness() -> dict:
+    """!
+    @brief Zwraca stan modelu na potrzeby sondy gotowości.
+    
+    Bez rozgrzewania model ładuje się leniwie, więc aplikacja jest gotowa
+    od razu; z rozgrzewaniem dopiero po zakończeniu próbnej inferencji.
+    
+    @return Słownik z polami ready, model_state, warmup i timings
+    @note Przy VISUALIZATION_BACKEND=remote zwracany jest stan modelu
+          serwera inferencji (model_state unreachable, jeśli nie odpowiada).
+    """
+    if inference_client is not None:
+        try:
+            return {**inference_client.call("status", timeout=2.0)["readiness"], "backend": "remote"}
+        except Exception as e:
+            logger.warning("Inference server unavailable: %s", e)
+            return {
+                "ready": False,
+                "model_state": "unreachable",
+                "warmup": VISUALIZATION_WARMUP,
+                "timings_ms": {},
+                "backend": "remote",
+            }
+    if VISUALIZATION_WARMUP:
+        ready = warmup_done and model_state == "ready"
+    else:
+        ready = model_state != "failed"
+    return {
+        "ready": ready,
+        "model_state": model_state,
+        "warmup": VISUALIZATION_WARMUP,
+        "timings_ms": dict(cold_start_timings),
+    }
+
+
+def inference_status() -> dict:
+    """!
+    @brief Zwraca stan modelu, statystyki planisty i pamięci osadzeń lokalnej inferencji.
+    """
+    return {
+        "readiness": readiness(),
+        "batching": batcher.stats(),
+        "prompt_cache": prompt_cache.stats(),
+    }
+
+
+def remote_status(section: str) -> dict:
+    """!
+    @brief Zwraca wybraną część inference_status z miejsca wykonywania inferencji.
+    
+    @param section batching lub prompt_cache
+    @return Statystyki lokalne albo serwera inferencji
+    """
+    if inference_client is None:
+        return inference_status()[section]
+    return inference_client.call("status", timeout=2.0)[section]
+
+
+def shutdown_executor():
+    """!
+    @brief Zamyka pulę wątków inferencji i połączenia z serwerem inferencji przy wyłączaniu aplikacji.
+    """
+    _executor.shutdown(wait=False, cancel_futures=True)
+    if inference_client is not None:
+        inference_client.close()
+
+
+def encode_prompts(pipe, prompts: list):
+    """!
+    @brief Koduje prompty koderem tekstu pipeline'u (bez negatywnych promptów).
+    
+    @param pipe Pipeline modelu
+    @param prompts Lista promptów
+    @return Osadzenia o kształcie (len(prompts), tokeny, wymiar)
+    """
+    prompt_embeds, _ = pipe.encode_prompt(
+        prompts,
+        getattr(pipe, "device", "cpu"),
+        1,
+        False
+    )
+    return prompt_embeds
+
+
+def seed_generator(pipe, seed: int):
+    """!
+    @brief Tworzy generator liczb losowych szumu początkowego dla danego ziarna.
+    
+    Pipeline może dostarczyć własny generator metodą seed_generator(seed),
+    w przeciwnym razie używany jest torch.Generator.
+    """
+    factory = getattr(pipe, "seed_generator", None)
+    if factory is not None:
+        return factory(seed)
+    import torch
+    return torch.Generator("cpu").manual_seed(seed)
+
+
+def render_batch(items: list) -> list:
+    """!
+    @brief Synchronicznie generuje partię obrazów jednym wywołaniem modelu.
+    
+    Funkcja blokuje wątek na czas inferencji, dlatego jest wywoływana
+    wyłącznie z puli wątków _executor przez planistę mikro-partii.
+    Powtórzone w partii pary (prompt, ziarno) są generowane tylko raz.
+    Osadzenia promptów są brane z prompt_cache, więc koder tekstu działa
+    tylko dla nowych promptów.
+    
+    @param items Lista par (prompt, ziarno)
+    @return Lista par (obraz PIL, raport żądania), w kolejności items
+    @note Przy guidance_scale > 1 pipeline potrzebuje też osadzeń negatywnych,
+          więc prompty są wtedy przekazywane bez pamięci podręcznej.
+    """
+    pipe = get_model()
+    
+    unique = list(dict.fromkeys(items))
+    prompts = [prompt for prompt, _ in unique]
+    generators = [seed_generator(pipe, seed) for _, seed in unique]
+    if GENERATION_PARAMS["guidance_scale"] <= 1.0 and hasattr(pipe, "encode_prompt"):
+        prompt_embeds, reports = prompt_cache.embed(lambda batch: encode_prompts(pipe, batch), prompts)
+        start = time.perf_counter()
+        images = pipe(prompt_embeds=prompt_embeds, generator=generators, **GENERATION_PARAMS).images
+    else:
+        reports = {prompt: {"prompt_cache": "disabled"} for prompt in prompts}
+        start = time.perf_counter()
+        images = pipe(prompt=prompts, generator=generators, **GENERATION_PARAMS).images
+    # Przy osadzeniach z prompt_cache render_ms nie obejmuje czasu kodera tekstu
+    render_ms = round((time.perf_counter() - start) * 1000, 1)
+    
+    results = {
+        item: (image, {**reports[item[0]], "batch_size": len(unique), "render_ms": render_ms})
+        for item, image in zip(unique, images)
+    }
+    return [results[item] for item in items]
+
+
+def render_with_params(prompt: str, seed: int, generation_params: dict):
+    """!
+    @brief Synchronicznie generuje jeden obraz z podanymi parametrami, z pominięciem planisty.
+    
+    Używana przy odtwarzaniu wizualizacji zapisanej z innymi parametrami
+    niż bieżące GENERATION_PARAMS.
+    
+    @return Para (obraz PIL, raport żądania)
+    """
+    pipe = get_model()
+    start = time.perf_counter()
+    image = pipe(prompt=prompt, generator=seed_generator(pipe, seed), **generation_params).images[0]
+    render_ms = round((time.perf_counter() - start) * 1000, 1)
+    return image, {"prompt_cache": "disabled", "batch_size": 1, "render_ms": render_ms}
+
+
+## Planista łączący równoległe żądania w partie (VISUALIZATION_BATCH_WINDOW_MS, VISUALIZATION_MAX_BATCH)
+batcher = MicroBatcher(
+    render_batch,
+    _executor,
+    workers=VISUALIZATION_WORKERS,
+    window=float(os.getenv("VISUALIZATION_BATCH_WINDOW_MS", "25")) / 1000,
+    max_batch=int(os.getenv("VISUALIZATION_MAX_BATCH", "4"))
+)
+
+
+## Limit renderowań w toku: globalny (VISUALIZATION_QUEUE_DEPTH) i na klienta (VISUALIZATION_CLIENT_CONCURRENCY)
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("VISUALIZATION_QUEUE_DEPTH", "32")),
+    max_per_client=int(os.getenv("VISUALIZATION_CLIENT_CONCURRENCY", "2")),
+    capacity=VISUALIZATION_WORKERS * batcher.max_batch
+)
+
+
+def resolve_encoding(image_format: Optional[str] = None, quality: Optional[int] = None) -> tuple:
+    """!
+    @brief Uzupełnia format i jakość obrazu wartościami domyślnymi serwera.
+    
+    @param image_format Format żądany przez klienta (png, jpeg, webp) lub None
+    @param quality Jakość 1-100 żądana przez klienta lub None
+    @return Para (format, jakość); dla PNG jakość jest zawsze None
+    """
+    image_format = image_format or DEFAULT_IMAGE_FORMAT
+    if image_format == "png":
+        return image_format, None
+    return image_format, quality or DEFAULT_IMAGE_QUALITY
+
+
+def store_image(image, key: str, image_format: str, quality: Optional[int]) -> str:
+    """!
+    @brief Koduje obraz i zapisuje go w pamięci podręcznej.
+    
+    @return Nazwa pliku w IMAGES_DIR
+    """
+    start = time.perf_counter()
+    data = encode_image(image, image_format, quality)
+    visualization_phase.observe(time.perf_counter() - start, phase="image_encode")
+    return cache.put(key, data, IMAGE_EXTENSIONS[image_format])
+
+
+def describe_visualization(
+    order_data: dict,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None
+) -> dict:
+    """!
+    @brief Wyznacza wszystko, co potrzebne do (ponownego) wygenerowania wizualizacji.
+    
+    Ziarno szumu jest wyprowadzane ze składu bukietu i parametrów modelu
+    (bez formatu pliku), więc ten sam bukiet wygląda tak samo w każdym
+    formacie, a po usunięciu pliku z pamięci podręcznej można go odtworzyć.
     
     @param order_data Słownik zawierający listy: flowers, papers, ribbons
-    @return Obraz w formacie base64 data URL lub placeholder w przypadku błędu
+    @param image_format Format wyjściowy (png, jpeg, webp); domyślnie VISUALIZATION_FORMAT
+    @param quality Jakość kodowania 1-100; domyślnie VISUALIZATION_QUALITY
+    @return Słownik key (klucz kompozycji), seed, prompt i params (model, format, jakość, parametry generowania)
     """
+    image_format, quality = resolve_encoding(image_format, quality)
+    params = {
+        "model": MODEL_ID,
+        "format": image_format,
+        "quality": quality,
+        **GENERATION_PARAMS
+    }
+    seed_key = composition_key(order_data, {"model": MODEL_ID, **GENERATION_PARAMS})
+    start = time.perf_counter()
     prompt = create_prompt_from_order(order_data)
-    print(order_data)
+    visualization_phase.observe(time.perf_counter() - start, phase="prompt")
+    return {
+        "key": composition_key(order_data, params),
+        "seed": int(seed_key[:8], 16) & 0x7FFFFFFF,
+        "prompt": prompt,
+        "params": params,
+    }
+
+
+async def render_image(prompt: str, seed: int, generation_params: Optional[dict] = None) -> tuple:
+    """!
+    @brief Generuje obraz modelem w tym procesie.
+    
+    @param prompt Prompt wizualizacji
+    @param seed Ziarno szumu początkowego
+    @param generation_params Parametry generowania; None - bieżące GENERATION_PARAMS
+           (żądanie trafia wtedy do planisty mikro-partii)
+    @return Para (obraz PIL, raport żądania)
+    """
+    if generation_params is None:
+        return await batcher.submit((prompt, seed))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, render_with_params, prompt, seed, generation_params)
+
+
+async def _render(spec: dict, generation_params: Optional[dict]) -> tuple:
+    if inference_client is not None:
+        return await inference_client.render(spec["prompt"], spec["seed"], generation_params)
+    return await render_image(spec["prompt"], spec["seed"], generation_params)
+
+
+async def render_visualization(spec: dict, report: Optional[dict] = None, client: Optional[str] = None) -> str:
+    """!
+    @brief Zwraca plik wizualizacji z pamięci podręcznej albo generuje go ze specyfikacji.
+    
+    @param spec Wynik describe_visualization (także odczytany z bazy)
+    @param report Opcjonalny słownik uzupełniany raportem żądania
+    @param client Klucz klienta dla kontroli dopuszczania; None - bez limitów
+           (np. zadania w tle, ograniczone własną kolejką)
+    @return Nazwa pliku w IMAGES_DIR
+    @throws AdmissionRejected jeśli renderowanie przekroczyłoby limity admission
+    @throws Exception błędy modelu i zapisu są przekazywane wywołującemu
+    """
+    if report is None:
+        report = {}
+    name = cache.lookup(spec["key"])
+    report["image_cache"] = "miss" if name is None else "hit"
+    if name is not None:
+        return name
+    
+    params = dict(spec["params"])
+    image_format = params.pop("format")
+    quality = params.pop("quality")
+    model = params.pop("model")
+    
+    generation_params = None if model == MODEL_ID and params == GENERATION_PARAMS else params
+    if client is None:
+        image, render_report = await _render(spec, generation_params)
+    else:
+        with admission.admit(client):
+            image, render_report = await _render(spec, generation_params)
+    admission.observe(render_report["render_ms"] / 1000)
+    visualization_phase.observe(render_report["render_ms"] / 1000, phase="render")
+    if render_report.get("prompt_cache") == "miss":
+        visualization_phase.observe(render_report["encode_ms"] / 1000, phase="text_encode")
+    report.update(render_report)
+    logger.info(
+        "Visualization rendered: prompt cache %s, encoder %.1f ms, render %.1f ms (batch of %d)",
+        render_report["prompt_cache"], render_report.get("encode_ms", 0.0),
+        render_report["render_ms"], render_report["batch_size"]
+    )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, store_image, image, spec["key"], image_format, quality)
+
+
+async def generate_bouquet_visualization(
+    order_data: dict,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+    report: Optional[dict] = None,
+    client: Optional[str] = None
+) -> str:
+    """!
+    @brief Generuje wizualizację bukietu na podstawie danych zamówienia.
+    
+    @param order_data Słownik zawierający listy: flowers, papers, ribbons
+    @param image_format Format wyjściowy (png, jpeg, webp); domyślnie VISUALIZATION_FORMAT
+    @param quality Jakość kodowania 1-100; domyślnie VISUALIZATION_QUALITY
+    @param report Opcjonalny słownik uzupełniany raportem żądania: spec, image_name
+                  (tylko po sukcesie), image_cache, prompt_cache (hit/miss),
+                  encode_ms, render_ms, batch_size, preview (True, jeśli zwrócono podgląd)
+    @param client Klucz klienta dla kontroli dopuszczania (None - bez limitów)
+    @return URL pliku obrazu w IMAGES_URL, a w przypadku błędu modelu URL
+            podglądu złożonego ze zdjęć produktów (composite.py)
+    @throws AdmissionRejected jeśli model jest przeciążony
+    @note Inferencja działa w puli wątków, więc pętla zdarzeń obsługuje
+          w tym czasie pozostałe żądania. Kodowanie obrazu odbywa się w
+          domyślnej puli wątków, aby nie zajmować wątku inferencji.
+          Identyczne składy bukietów są zwracane z pamięci podręcznej
+          bez ponownego generowania.
+    """
+    if report is None:
+        report = {}
+    spec = describe_visualization(order_data, image_format, quality)
+    report["spec"] = spec
+    logger.debug("Rendering visualization for %s", order_data)
     
     try:
-        pipe = get_model()
-        
-        images = pipe(
-            prompt=prompt,
-            width=512,
-            height=512,
-            num_inference_steps=1,
-            guidance_scale=1.0
-        ).images
-        
-        buffered = io.BytesIO()
-        images[0].save(buffered, format="PNG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_base64}"
-        
+        name = await render_visualization(spec, report, client)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error("Błąd generowania wizualizacji: %s", e)
+        return await preview_visualization(order_data, image_format, quality, report)
+    
+    report["image_name"] = name
+    return f"{IMAGES_URL}/{name}"
+
+
+async def preview_visualization(
+    order_data: dict,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+    report: Optional[dict] = None
+) -> str:
+    """!
+    @brief Zwraca podgląd bukietu złożony ze zdjęć produktów, bez udziału modelu.
+    
+    @param order_data Słownik zawierający listy: flowers, papers, ribbons (z polem icon)
+    @param image_format Format wyjściowy (png, jpeg, webp); domyślnie VISUALIZATION_FORMAT
+    @param quality Jakość kodowania 1-100; domyślnie VISUALIZATION_QUALITY
+    @param report Opcjonalny słownik raportu (ustawiane jest preview)
+    @return URL podglądu lub obrazu zastępczego, jeśli złożenie podglądu się nie powiodło
+    """
+    if report is not None:
+        report["preview"] = True
+    image_format, quality = resolve_encoding(image_format, quality)
+    try:
+        return await composite.preview_url(order_data, image_format, quality)
     except Exception as e:
-        print(f"Błąd generowania wizualizacji: {e}")
+        logger.error("Błąd składania podglądu wizualizacji: %s", e)
         return generate_placeholder_image()
 
 
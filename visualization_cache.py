@@ -0,0 +1,193 @@
+"""!
+@file visualization_cache.py
+@brief Dyskowa pamięć podręczna wygenerowanych wizualizacji bukietów.
+
+Wpisy to pliki w katalogu serwowanym statycznie, ograniczone łącznym
+rozmiarem (usuwane od najdawniej używanych, LRU) i maksymalnym wiekiem. Kluczem jest
+skrót kanonicznego składu bukietu. Treść plików nie jest trzymana w
+pamięci - indeks przechowuje tylko nazwy, rozmiary i czasy zapisu.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+## Wzorzec nazwy pliku przechowywanego w katalogu pamięci podręcznej
+_FILE_PATTERN = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+def composition_key(order_data: dict, params: dict) -> str:
+    """!
+    @brief Wyznacza klucz pamięci podręcznej dla składu bukietu.
+
+    Kolejność pozycji nie ma znaczenia, a ilości tego samego kwiatu
+    podane w kilku pozycjach są sumowane.
+
+    @param order_data Słownik z listami: flowers (id, quantity), papers (id), ribbons (id)
+    @param params Parametry generowania (model, rozdzielczość, liczba kroków itp.)
+    @return Skrót SHA-256 w postaci szesnastkowej
+    """
+    flowers = {}
+    for flower in order_data.get('flowers', []):
+        flowers[flower['id']] = flowers.get(flower['id'], 0) + flower['quantity']
+
+    canonical = {
+        "flowers": sorted(flowers.items()),
+        "papers": sorted(p['id'] for p in order_data.get('papers', [])),
+        "ribbons": sorted(r['id'] for r in order_data.get('ribbons', [])),
+        "params": params,
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class VisualizationCache:
+    """!
+    @brief Pamięć podręczna obrazów w postaci plików na dysku.
+
+    Klasa jest bezpieczna wątkowo - sprawdzenia wykonywane są w pętli
+    zdarzeń, a zapisy plików w wątkach roboczych.
+    """
+
+    def __init__(self, directory: Path, disk_bytes: int, max_age: float):
+        """!
+        @param directory Katalog przechowywania plików
+        @param disk_bytes Budżet bajtów plików na dysku
+        @param max_age Maksymalny wiek wpisu w sekundach
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.disk_bytes = disk_bytes
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        ## key -> (nazwa pliku, rozmiar, czas zapisu), od najdawniej używanego
+        self._disk = OrderedDict()
+        self._disk_size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._scan_directory()
+
+    def _scan_directory(self):
+        """!
+        @brief Odtwarza indeks plików dyskowych po restarcie aplikacji.
+        """
+        entries = []
+        for path in self.directory.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if not match:
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime, match.group(1), path.name, stat.st_size))
+
+        for mtime, key, name, size in sorted(entries):
+            self._disk[key] = (name, size, mtime)
+            self._disk_size += size
+        self._evict_disk(time.time())
+
+    def contains(self, key: str) -> bool:
+        """!
+        @brief Sprawdza, czy plik wpisu istnieje, bez liczenia trafień.
+
+        @param key Klucz kompozycji
+        @return True, jeśli lookup najpewniej zwróci nazwę pliku
+        """
+        with self._lock:
+            entry = self._disk.get(key)
+            if entry is None:
+                return False
+            name, _, stored_at = entry
+            return time.time() - stored_at <= self.max_age and (self.directory / name).exists()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """!
+        @brief Sprawdza obecność pliku wpisu bez odczytu jego zawartości.
+
+        @param key Klucz kompozycji
+        @return Nazwa pliku w katalogu pamięci podręcznej lub None
+        """
+        with self._lock:
+            entry = self._disk.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            name, _, stored_at = entry
+            expired = time.time() - stored_at > self.max_age
+            if expired or not (self.directory / name).exists():
+                # Plik mógł zostać usunięty poza pamięcią podręczną (np. przy sprzątaniu katalogu)
+                self._drop_disk(key)
+                self.evictions += expired
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+            self.hits += 1
+            return name
+
+    def put(self, key: str, data: bytes, extension: str = "png") -> str:
+        """!
+        @brief Zapisuje obraz na dysku.
+
+        @param key Klucz kompozycji
+        @param data Zakodowany obraz
+        @param extension Rozszerzenie pliku na dysku
+        @return Nazwa zapisanego pliku
+        """
+        name = f"{key}.{extension}"
+        path = self.directory / name
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            if key in self._disk:
+                self._disk_size -= self._disk.pop(key)[1]
+            self._disk[key] = (name, len(data), now)
+            self._disk_size += len(data)
+            self._evict_disk(now)
+        return name
+
+    def _drop_disk(self, key: str):
+        name, size, _ = self._disk.pop(key)
+        self._disk_size -= size
+        try:
+            (self.directory / name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict_disk(self, now: float):
+        # Po restarcie kolejność LRU przybliża czas modyfikacji plików
+        while self._disk:
+            oldest = next(iter(self._disk))
+            _, _, stored_at = self._disk[oldest]
+            if self._disk_size <= self.disk_bytes and now - stored_at <= self.max_age:
+                break
+            self._drop_disk(oldest)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """!
+        @brief Zwraca liczniki trafień i zajętość dysku.
+
+        @return Słownik ze statystykami pamięci podręcznej
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._disk),
+                "bytes": self._disk_size,
+            }